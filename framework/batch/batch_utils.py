@@ -6,6 +6,7 @@ import importlib.util
 import inspect
 import os
 import sys
+from typing import Optional
 
 # Introduce path to realsim
 sys.path.append(os.path.abspath(
@@ -29,11 +30,11 @@ scheduler_hierarchy = import_schedulers_hierarchy(os.path.abspath(os.path.join(o
 from api.loader import LoadManager
 
 # Database
-from realsim.jobs.utils import deepcopy_list
 from realsim.database import Database
 
 # Generators
 from realsim.generators.AGenerator import AbstractGenerator
+from realsim.generators.ACustomLogs import AbstractCustomLogsGenerator
 from realsim.generators.random import RandomGenerator
 from realsim.generators.randomfromlist import RandomFromListGenerator
 from realsim.generators.keysdict import KeysDictGenerator
@@ -49,6 +50,7 @@ from realsim.generators.distribution.poissondistr import PoissonDistribution
 
 # Cluster
 from realsim.cluster.cluster import Cluster
+from realsim.cluster.arraycluster import ArrayCluster
 
 # Schedulers
 from realsim.scheduler.scheduler import Scheduler
@@ -59,6 +61,10 @@ from realsim.logger.logger import Logger
 # ComputeEngine
 from realsim.compengine import ComputeEngine
 
+# Completion ledger and result cache
+from batch.ledger import config_hash, file_digest, ledger_path, load_input, pending_simulations, store_input, stored_input_path
+from batch.cache import cache_entry_path, simulation_key
+
 def import_module(path):
     mod_name = os.path.basename(path).replace(".py", "")
     spec = importlib.util.spec_from_file_location(mod_name, path)
@@ -118,6 +124,12 @@ class BatchCreator:
             "Poisson": PoissonDistribution
         }
 
+        # Ready to use cluster backends for the occupancy of the cores
+        self.__impl_clusters = {
+            "procset": Cluster,
+            "array": ArrayCluster
+        }
+
         # Ready to use schedulers implementing the Scheduler interface
         self.__impl_schedulers = {}
         for sched_key, sched_val in scheduler_hierarchy.items():
@@ -148,6 +160,9 @@ class BatchCreator:
         # If using MPI store modules that should be exported to other MPI procs
         self.mods_export = list()
 
+        # The simulations that finished are recorded in the ledger
+        self.ledger_path = ledger_path(project_file_path)
+
     def get_sim_configs_num(self) -> int:
         logger.debug("Calculating the total number of simulation configurations")
         inputs_num = 0
@@ -156,14 +171,75 @@ class BatchCreator:
 
         return inputs_num * len(self.__project_schedulers)
 
-    def process_inputs(self) -> None:
+    def get_input_hashes(self) -> list[str]:
+        """Hash the configuration of each input, in the order of their ids
+        """
+        return [config_hash({"input": input, "repetition": repetition})
+                for input in self.__project_inputs
+                for repetition in range(int(input.get("repeat", 1)))]
+
+    def get_sim_hashes(self) -> list[str]:
+        """Hash the configuration of each simulation, in the order of their
+        ids, from the input, the job set stored for it, the scheduler and the
+        actions that apply to it. A stream of jobs is covered by its file and
+        an input that is not stored yet has no job set.
+        """
+
+        def selected(selection, index):
+            return selection == "all" or index in selection
+
+        input_hashes = self.get_input_hashes()
+
+        sim_hashes = list()
+        input_index = 0
+        for input in self.__project_inputs:
+            stream = input.get("generator", dict()).get("stream", False)
+            for repetition in range(int(input.get("repeat", 1))):
+                stored_path = stored_input_path(self.ledger_path, input_index, input_hashes[input_index])
+                jobs = file_digest(stored_path) if not stream and os.path.exists(stored_path) else None
+                for sched_index, sched_dict in enumerate(self.__project_schedulers):
+                    actions = {action: options for action, options in self.__project_actions.items()
+                               if selected(options["inputs"], input_index) and selected(options["schedulers"], sched_index)}
+                    sim_hashes.append(config_hash({
+                        "input": input,
+                        "repetition": repetition,
+                        "jobs": jobs,
+                        "scheduler": sched_dict,
+                        "actions": actions
+                    }))
+                input_index += 1
+
+        return sim_hashes
+
+    def get_pending_sims(self, resume: bool = False) -> list[int]:
+        """The ids of the simulations that will run; a resumed project skips
+        the ones that finished with the same configuration
+        """
+        return pending_simulations(self.ledger_path, self.get_sim_hashes(), resume)
+
+    def process_inputs(self, needed: Optional[set[int]] = None, resume: bool = False) -> None:
+        """Generate the job set of each input
+        + needed : the ids of the inputs to generate; the rest are None
+        + resume : reuse the job sets that are stored for the project
+        """
 
         logger.debug("Begin processing the inputs")
 
         # Process the inputs
         self.__inputs = list()
 
+        input_hashes = self.get_input_hashes()
+        input_index = 0
+
         for input in self.__project_inputs:
+
+            repeat = int(input.get("repeat", 1))
+
+            # No simulation of the input has to run
+            if needed is not None and not needed.intersection(range(input_index, input_index + repeat)):
+                self.__inputs.extend([None] * repeat)
+                input_index += repeat
+                continue
         
             # Create a LoadManager based on the options given
             machine = input.get("loads-machine", "")
@@ -228,75 +304,119 @@ class BatchCreator:
                         raise RuntimeError(f"The name {gen_type} of the generator provided does not exist")
 
                 # Create instance of generator
-                gen_inst = gen_cls(load_manager=lm)
-                # gen_inst = gen_cls()
+                if issubclass(gen_cls, AbstractCustomLogsGenerator):
+                    gen_inst = gen_cls(load_manager=lm)
+                else:
+                    gen_inst = gen_cls()
             
                 logger.debug(f"Got the generator: {gen_inst.name}")
 
-                if "repeat" in input:
-                    repeat = int(input["repeat"])
-                else:
-                    repeat = 1
-
                 for _ in range(repeat):
 
-                    # Generate the input
-                    if gen_type in ["List Generator","Shuffle List Generator"]:
-                        with open(gen_arg, 'r') as _f:
-                            gen_data = _f.read()
-                        gen_input = gen_inst.generate_jobs_set(gen_data)
+                    # The inputs of the simulations that do not have to run
+                    # are not generated
+                    if needed is not None and input_index not in needed:
+                        self.__inputs.append(None)
+                        input_index += 1
+                        continue
+
+                    stream = generator.get("stream", False)
+                    stored_path = stored_input_path(self.ledger_path, input_index, input_hashes[input_index])
+
+                    # A resumed project reuses the job set that was stored for
+                    # the input, so its simulations share the same jobs
+                    if resume and not stream and os.path.exists(stored_path):
+                        gen_input = load_input(stored_path)
+                        logger.debug(f"Loaded the stored input: {stored_path}")
+                    else:
+                        gen_input = self.generate_input(gen_inst, gen_type, gen_arg, generator)
+                        if not stream:
+                            store_input(stored_path, gen_input)
 
-                    elif gen_type in ["Random From List Generator"]:
-                        with open(gen_arg[1], 'r') as _f:
-                            gen_data = _f.read()
-                        gen_input = gen_inst.generate_jobs_set([gen_arg[0], gen_data])
+                    nodes = int(input["cluster"]["nodes"])
+                    socket_conf = tuple(input["cluster"]["socket-conf"])
 
-                    else:
-                        gen_input = gen_inst.generate_jobs_set(gen_arg)
+                    backend = input["cluster"].get("backend", "procset")
+                    try:
+                        cluster_cls = self.__impl_clusters[backend]
+                    except:
+                        raise RuntimeError(f"Cluster backend {backend} does not exist")
 
+                    # The trace can be simulated in parts between the instants
+                    # its cluster drains by a pool of processes
+                    split_workers = int(input.get("split-workers", 1))
+                    if split_workers > 1 and generator.get("stream", False):
+                        raise RuntimeError("A stream of jobs can not be split at drain points")
 
-                    logger.debug(f"Finished generating the input")
+                    self.__inputs.append((gen_input, heatmap, nodes, socket_conf, cluster_cls, split_workers))
+                    input_index += 1
 
-                    # Check if a transformer distribution is provided by the user
-                    if "distribution" in generator:
-                    
-                        distribution = generator["distribution"]
-                        distr_type = distribution["type"]
-                        distr_arg = distribution["arg"]
+            else:
+                raise RuntimeError("A generator was not provided")
 
-                        # If a path is provided for the distribution transformer
-                        if os.path.exists(distr_type) and ".py" in distr_type:
-                            spec_name = import_module(distr_type)
-                            distr_mod = sys.modules[spec_name]
-                            classes = inspect.getmembers(distr_mod, inspect.isclass)
-                            classes = list(filter(lambda it: not inspect.isabstract(it[1]) and issubclass(it[1], IDistribution), classes))
-                            # If there are multiple then inform the user that the first will be used
-                            if len(classes) > 1:
-                                logger.debug(f"Multiple distribution definitions were found. Using the first definition: {classes[0][0]}")
+        logger.debug("Finished processing the inputs")
 
-                            _, distr_cls = classes[0]
-                            # Export module for MPI procs
-                            self.mods_export.append(distr_type)
-                        else:
-                            try:
-                                distr_cls = self.__impl_distributions[distr_type]
-                            except:
-                                raise RuntimeError(f"Distribution of type {distr_type} does not exist")
+    def generate_input(self, gen_inst: AbstractGenerator, gen_type: str, gen_arg, generator: dict):
+        """Generate the job set of an input and apply its distribution
+        """
 
-                        distr_inst = distr_cls()
-                        distr_inst.apply_distribution(gen_input, time_step=distr_arg)
+        # Generate the input
+        if gen_type in ["List Generator","Shuffle List Generator"]:
+            with open(gen_arg, 'r') as _f:
+                gen_data = _f.read()
+            gen_input = gen_inst.generate_jobs_set(gen_data)
 
-                        logger.debug(f"A distribution was applied to the input: {distr_inst.name}")
+        elif gen_type in ["Random From List Generator"]:
+            with open(gen_arg[1], 'r') as _f:
+                gen_data = _f.read()
+            gen_input = gen_inst.generate_jobs_set([gen_arg[0], gen_data])
 
+        elif generator.get("stream", False):
+            # Jobs are read lazily while the simulation advances
+            if not hasattr(gen_inst, "generate_jobs_stream"):
+                raise RuntimeError(f"The generator {gen_inst.name} can not stream its jobs")
+            if "distribution" in generator:
+                raise RuntimeError("A distribution can not be applied to a stream of jobs")
+            gen_input = gen_inst.generate_jobs_stream(gen_arg)
 
-                    nodes = int(input["cluster"]["nodes"])
-                    socket_conf = tuple(input["cluster"]["socket-conf"])
-                    self.__inputs.append((gen_input, heatmap, nodes, socket_conf))
+        else:
+            gen_input = gen_inst.generate_jobs_set(gen_arg)
+
+
+        logger.debug(f"Finished generating the input")
+
+        # Check if a transformer distribution is provided by the user
+        if "distribution" in generator:
 
+            distribution = generator["distribution"]
+            distr_type = distribution["type"]
+            distr_arg = distribution["arg"]
+
+            # If a path is provided for the distribution transformer
+            if os.path.exists(distr_type) and ".py" in distr_type:
+                spec_name = import_module(distr_type)
+                distr_mod = sys.modules[spec_name]
+                classes = inspect.getmembers(distr_mod, inspect.isclass)
+                classes = list(filter(lambda it: not inspect.isabstract(it[1]) and issubclass(it[1], IDistribution), classes))
+                # If there are multiple then inform the user that the first will be used
+                if len(classes) > 1:
+                    logger.debug(f"Multiple distribution definitions were found. Using the first definition: {classes[0][0]}")
+
+                _, distr_cls = classes[0]
+                # Export module for MPI procs
+                self.mods_export.append(distr_type)
             else:
-                raise RuntimeError("A generator was not provided")
+                try:
+                    distr_cls = self.__impl_distributions[distr_type]
+                except:
+                    raise RuntimeError(f"Distribution of type {distr_type} does not exist")
 
-        logger.debug("Finished processing the inputs")
+            distr_inst = distr_cls()
+            distr_inst.apply_distribution(gen_input, time_step=distr_arg)
+
+            logger.debug(f"A distribution was applied to the input: {distr_inst.name}")
+
+        return gen_input
 
     def process_schedulers(self) -> None:
 
@@ -407,25 +527,48 @@ class BatchCreator:
 
         logger.debug(f"Finished processing the postprocessing actions: {self.__extra_features}")
 
-    def create_ranks(self) -> None:
-        self.process_inputs()
+    def create_ranks(self, resume: bool = False) -> None:
+
+        # Only the inputs of the simulations that have to run are generated
+        pending = set(self.get_pending_sims(resume))
+        schedulers_num = len(self.__project_schedulers)
+        needed = {sim_idx // schedulers_num for sim_idx in pending}
+
+        self.process_inputs(needed, resume)
         self.process_schedulers()
         self.process_actions()
 
+        # The hashes cover the job sets that were stored for the inputs
+        sim_hashes = self.get_sim_hashes()
+
         # Id for the simulation run
         sim_idx = 0
 
+        # Periodic snapshots of the simulations
+        checkpoints = self.config.get("checkpoints")
+
+        # The finished simulations stored by their content
+        cache_dir = self.config.get("cache")
+
         # Create the ranks
         self.ranks = list()
-        for input_index, [input, heatmap, nodes, socket_conf] in enumerate(self.__inputs):
+        for input_index, processed_input in enumerate(self.__inputs):
             for [sched_index, sched_cls, sched_opts] in self.__schedulers:
+
+                # Skip the simulations that already finished
+                if sim_idx not in pending:
+                    logger.debug(f"Skipping simulation {sim_idx} that has already finished")
+                    sim_idx += 1
+                    continue
+
+                input, heatmap, nodes, socket_conf, cluster_cls, split_workers = processed_input
                 
                 # Create a database instance
-                database = Database(deepcopy_list(input), heatmap)
+                database = Database(input, heatmap)
                 database.setup()
 
                 # Create a cluster instance
-                cluster = Cluster(nodes, socket_conf)
+                cluster = cluster_cls(nodes, socket_conf)
 
                 # Create a scheduler instance
                 scheduler = sched_cls()
@@ -439,10 +582,24 @@ class BatchCreator:
                 # Create a compute engine instance
                 compengine = ComputeEngine(database, cluster, scheduler, evt_logger)
                 compengine.setup_preloaded_jobs()
+                compengine.split_workers = split_workers
+
+                # Store the state of the simulation periodically to resume it;
+                # a changed configuration does not resume an older snapshot
+                if checkpoints is not None:
+                    compengine.set_checkpoints(os.path.abspath(f"{checkpoints['dir']}/simulation_{sim_idx}_{sim_hashes[sim_idx][:16]}.snapshot"),
+                                               float(checkpoints["hours"]) * 3600)
+
+                # A simulation with the same content restores its result
+                cache_path = None
+                if cache_dir is not None:
+                    key = simulation_key(database, nodes, socket_conf, cluster_cls, sched_cls, sched_opts)
+                    if key is not None:
+                        cache_path = cache_entry_path(cache_dir, key)
 
                 # Set actions for this simulation
                 actions = self.__actions[input_index][sched_index]
 
-                self.ranks.append((sim_idx, input_index, sched_index, database, cluster, scheduler, evt_logger, compengine, actions, self.__extra_features))
+                self.ranks.append((sim_idx, input_index, sched_index, database, cluster, scheduler, evt_logger, compengine, actions, self.__extra_features, sim_hashes[sim_idx], cache_path))
 
                 sim_idx += 1
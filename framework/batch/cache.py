@@ -0,0 +1,145 @@
+"""
+The result cache of the simulations. The simulator is deterministic, so a
+simulation is identified by the content of everything that can change its
+outcome: the jobs, the heatmap, the cluster, the source code of the scheduler
+and of the simulation engine, and the options of the scheduler.
+
+A cache entry is the snapshot of the simulation when it finished (see
+realsim.snapshot) together with the files that its actions wrote. The actions
+and their options are not part of the key: the files of an action are stored
+next to the snapshot by the options that change their content, and on a hit
+they are copied to their destination. Only an action whose files are not
+stored restores the finished state from the snapshot and runs again.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import sys
+from functools import lru_cache
+from typing import Optional
+
+sys.path.append(os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..")
+))
+
+from batch.ledger import file_digest
+from realsim.database import Database
+
+REALSIM_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "../realsim"))
+
+# The folders of realsim that do not change the outcome of a simulation or
+# are accounted for separately: the jobs are hashed after they are generated
+# and only the scheduler classes that a simulation uses are hashed
+ENGINE_EXCLUDED = [
+    os.path.join(REALSIM_PATH, "generators"),
+    os.path.join(REALSIM_PATH, "plotter"),
+    os.path.join(REALSIM_PATH, "scheduler", "schedulers"),
+    os.path.join(REALSIM_PATH, "scheduler", "coschedulers")
+]
+
+
+@lru_cache(maxsize=None)
+def engine_digest() -> str:
+    """Hash the sources of the simulation engine; computed once per process
+    """
+    digest = hashlib.sha256()
+    for dirpath, dirnames, filenames in os.walk(REALSIM_PATH):
+        dirnames[:] = sorted(dirname for dirname in dirnames
+                             if os.path.join(dirpath, dirname) not in ENGINE_EXCLUDED)
+        for filename in sorted(filenames):
+            if filename.endswith(".py"):
+                path = os.path.join(dirpath, filename)
+                digest.update(os.path.relpath(path, REALSIM_PATH).encode())
+                digest.update(file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def scheduler_digest(sched_cls: type) -> str:
+    """Hash the sources of a scheduler class and of the classes it inherits
+    """
+    digest = hashlib.sha256()
+    for cls in sched_cls.__mro__:
+        try:
+            path = inspect.getsourcefile(cls)
+        except TypeError:
+            # Built-in classes have no sources
+            continue
+        if path is not None and os.path.isfile(path):
+            digest.update(cls.__qualname__.encode())
+            digest.update(file_digest(path).encode())
+    return digest.hexdigest()
+
+
+def jobs_digest(database: Database) -> Optional[str]:
+    """Hash the jobs of a database or the file of a stream of jobs; None if
+    the jobs can not be identified
+    """
+    digest = hashlib.sha256()
+
+    if database.jobs_stream is not None:
+        path = getattr(database.jobs_stream, "path", None)
+        if path is None or not os.path.isfile(path):
+            return None
+        digest.update(file_digest(path).encode())
+    else:
+        for job in database.preloaded_queue:
+            digest.update(repr((job.job_name, job.num_of_processes, job.remaining_time,
+                                job.submit_time, job.wall_time)).encode())
+
+    return digest.hexdigest()
+
+
+def simulation_key(database: Database,
+                   nodes: int,
+                   socket_conf: tuple,
+                   cluster_cls: type,
+                   sched_cls: type,
+                   sched_opts: list[tuple]) -> Optional[str]:
+    """The content hash of a simulation or None if it can not be cached
+    """
+    jobs = jobs_digest(database)
+    if jobs is None:
+        return None
+
+    content = json.dumps({
+        "jobs": jobs,
+        "heatmap": database.heatmap,
+        "cluster": [nodes, list(socket_conf), cluster_cls.__name__],
+        "scheduler": [sched_cls.__name__, scheduler_digest(sched_cls)],
+        "options": sorted([opt, val] for opt, val in sched_opts),
+        "engine": engine_digest()
+    }, sort_keys=True, default=str)
+
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def cache_entry_path(cache_dir: str, key: str) -> str:
+    return os.path.abspath(os.path.join(cache_dir, key[:2], f"{key}.snapshot"))
+
+
+# The options of the actions that only decide where their files are written
+PLACEMENT_OPTIONS = ["sim_idx", "inp_idx", "sched_idx", "dir", "img_dir", "workload_dir"]
+
+
+def action_output_entry(cache_path: str, action: str, options: dict) -> str:
+    """The stored file of an action of a cached simulation
+    """
+    content = json.dumps({
+        "action": action,
+        "options": sorted([opt, val] for opt, val in options.items() if opt not in PLACEMENT_OPTIONS)
+    }, sort_keys=True, default=str)
+    digest = hashlib.sha256(content.encode()).hexdigest()[:16]
+
+    return f"{os.path.splitext(cache_path)[0]}.outputs/{action}_{digest}"
+
+
+def copy_atomic(src: str, dst: str) -> None:
+    """Copy a file so that a reader never sees it partially written
+    """
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
@@ -0,0 +1,138 @@
+"""
+The completion ledger of a project records every simulation that finished,
+together with a hash of its configuration. When a project is resumed the
+simulations that are in the ledger with the same hash are skipped, so only
+the missing or changed ones run again.
+
+The ledger is a file of JSON lines next to the project file. Each simulation
+appends its own line when it finishes, which is safe with many writers and
+survives a crash; a line left incomplete by a crash is ignored.
+
+The generators may draw random workloads, so the job set of every input is
+stored next to the ledger when it is generated. A resumed project reuses the
+stored job sets and the hash of a simulation covers the job set it ran on, so
+the simulations of an input always share the same jobs.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Any
+
+
+def ledger_path(project_file_path: str) -> str:
+    return f"{os.path.splitext(os.path.abspath(project_file_path))[0]}.ledger"
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_hash(config: Any) -> str:
+    """Hash a piece of the project configuration. The contents of the files
+    that it references (traces, heatmaps, custom schedulers, ..) are part of
+    the hash so that changing them is also a change of the configuration.
+    """
+    files = dict()
+
+    def collect(value):
+        if isinstance(value, dict):
+            for item in value.values():
+                collect(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                collect(item)
+        elif isinstance(value, str) and value not in files and os.path.isfile(value):
+            files[value] = file_digest(value)
+
+    collect(config)
+
+    content = json.dumps({"config": config, "files": files}, sort_keys=True, default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def read_ledger(path: str) -> dict[int, str]:
+    """Return the hash of the configuration of each finished simulation by its
+    id; later records of a simulation override the earlier ones
+    """
+    completed = dict()
+    if not os.path.exists(path):
+        return completed
+
+    with open(path, "r") as fd:
+        for line in fd:
+            try:
+                record = json.loads(line)
+                completed[int(record["sim_idx"])] = record["hash"]
+            except (ValueError, KeyError, TypeError):
+                continue
+
+    return completed
+
+
+def record_completion(path: str, sim_idx: int, sim_hash: str, **info) -> None:
+    """Append the record of a finished simulation and flush it to the disk
+    """
+    line = json.dumps({"sim_idx": sim_idx, "hash": sim_hash, **info}) + "\n"
+
+    fd = os.open(path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        # Do not append to a line that a crash left incomplete
+        size = os.fstat(fd).st_size
+        if size > 0 and os.pread(fd, 1, size - 1) != b"\n":
+            line = "\n" + line
+        os.write(fd, line.encode())
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def inputs_dir(path: str) -> str:
+    """The directory of the stored job sets of the project of a ledger
+    """
+    return f"{os.path.splitext(path)[0]}.inputs"
+
+
+def stored_input_path(path: str, input_index: int, input_hash: str) -> str:
+    return os.path.join(inputs_dir(path), f"input_{input_index}_{input_hash[:16]}.pkl")
+
+
+def store_input(path: str, jobs: list) -> None:
+    """Store a generated job set; the file is replaced atomically
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fd:
+        pickle.dump(jobs, fd, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_input(path: str) -> list:
+    with open(path, "rb") as fd:
+        return pickle.load(fd)
+
+
+def clear_ledger(path: str) -> None:
+    """Remove the ledger and the stored job sets of a project
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    shutil.rmtree(inputs_dir(path), ignore_errors=True)
+
+
+def pending_simulations(path: str, sim_hashes: list[str], resume: bool) -> list[int]:
+    """The ids of the simulations that have to run; when resuming, the ones
+    that finished with the same configuration are left out
+    """
+    if not resume:
+        return list(range(len(sim_hashes)))
+
+    completed = read_ledger(path)
+    return [sim_idx for sim_idx, sim_hash in enumerate(sim_hashes)
+            if completed.get(sim_idx) != sim_hash]
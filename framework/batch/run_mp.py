@@ -1,4 +1,4 @@
-from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from functools import partial
 from multiprocessing import freeze_support
 import os
@@ -10,7 +10,7 @@ sys.path.append(os.path.abspath(
 
 from batch.batch_utils import BatchCreator
 from common.utils import define_logger
-from run_utils import multiple_simulations
+from run_utils import longest_first, single_simulation
 
 if __name__ == "__main__":
     
@@ -21,24 +21,31 @@ if __name__ == "__main__":
 
     schematic_file_path = sys.argv[1]
     total_procs = int(sys.argv[2])
-    batch_size = int(sys.argv[3])
-    server_ipaddr = sys.argv[4]
-    server_port = int(sys.argv[5])
-    webui = bool(int(sys.argv[6]))
+    server_ipaddr = sys.argv[3]
+    server_port = int(sys.argv[4])
+    webui = bool(int(sys.argv[5]))
+    resume = bool(int(sys.argv[6])) if len(sys.argv) > 6 else False
 
     batch_creator = BatchCreator(schematic_file_path, webui)
-    batch_creator.create_ranks()
+    batch_creator.create_ranks(resume)
 
 
     logger.debug(f"Creating a process pool of {total_procs} max workers")
     executor = ProcessPoolExecutor(max_workers=total_procs)
 
-    multiple_simulations_partial = partial(multiple_simulations, server_ipaddr=server_ipaddr, server_port=server_port, webui=webui)
+    single_simulation_partial = partial(single_simulation, server_ipaddr=server_ipaddr, server_port=server_port, webui=webui, ledger_path=batch_creator.ledger_path)
 
-    for i in range(total_procs):
-        logger.debug(f"Worker {i} gets {batch_size} number of simulation configurations")
-        executor.submit(multiple_simulations_partial, batch_creator.ranks[i*batch_size:(i+1)*batch_size])
+    # Every simulation configuration is a separate task; an idle worker pulls
+    # the next one, starting from the longest expected
+    futures = dict()
+    for sim_batch in longest_first(batch_creator.ranks):
+        logger.debug(f"Queueing simulation configuration {sim_batch[0]}")
+        futures[executor.submit(single_simulation_partial, sim_batch)] = sim_batch[0]
 
     logger.debug(f"Waiting for the processes to finish")
+    for future in as_completed(futures):
+        if future.exception() is not None:
+            logger.error(f"The simulation configuration {futures[future]} failed", exc_info=future.exception())
+
     executor.shutdown(wait=True)
-    logger.debug(f"The processes have finished without any errors")
+    logger.debug(f"The processes have finished")
@@ -2,27 +2,36 @@ from mpi4py import MPI
 from functools import partial
 import os
 import sys
+from time import sleep
 
 sys.path.append(os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..")
 ))
 
 from batch.batch_utils import import_module
+from batch.ledger import ledger_path
 from common.utils import define_logger
-from run_utils import multiple_simulations
+from run_utils import longest_first, multiple_simulations, single_simulation
 
 class MPITransferTag:
     MODULES = 10
     SIMBATCH = 20
+    REQUEST = 30
+
+# Seconds that the dispatcher waits between polls for requests, so that it
+# does not keep a core busy
+DISPATCH_POLL_INTERVAL = 0.05
 
 comm = MPI.COMM_WORLD
 rank = comm.Get_rank()
 
 # Define the server IP address and port number for all MPI ranks
-server_ipaddr = sys.argv[3]
-server_port = int(sys.argv[4])
-webui = bool(int(sys.argv[5]))
-multiple_simulations_partial = partial(multiple_simulations, server_ipaddr=server_ipaddr, server_port=server_port, webui=webui)
+server_ipaddr = sys.argv[2]
+server_port = int(sys.argv[3])
+webui = bool(int(sys.argv[4]))
+resume = bool(int(sys.argv[5])) if len(sys.argv) > 5 else False
+multiple_simulations_partial = partial(multiple_simulations, server_ipaddr=server_ipaddr, server_port=server_port, webui=webui, ledger_path=ledger_path(sys.argv[1]))
+single_simulation_partial = partial(single_simulation, server_ipaddr=server_ipaddr, server_port=server_port, webui=webui, ledger_path=ledger_path(sys.argv[1]))
 
 if rank == 0:
 
@@ -30,15 +39,17 @@ if rank == 0:
     logger = define_logger(log_ancestry=True, log_env=True)
 
     schematic_file_path = sys.argv[1]
-    batch_size = int(sys.argv[2])
     total_procs = comm.Get_size()
 
     from batch.batch_utils import BatchCreator
     batch_creator = BatchCreator(schematic_file_path, webui)
-    batch_creator.create_ranks()
+    batch_creator.create_ranks(resume)
+
+    # The simulation configurations starting from the longest expected
+    sim_batches = longest_first(batch_creator.ranks)
 
     if total_procs > 1:
-        logger.debug("Start sending simulation configuration batches to other MPI ranks")
+        logger.debug("Start sending the modules to other MPI ranks")
         for i in range(1, total_procs):
             try:
                 logger.debug("Send the additional module that need to load")
@@ -46,17 +57,38 @@ if rank == 0:
                 comm.send(batch_creator.mods_export, dest=i, tag=MPITransferTag.MODULES)
             except:
                 logger.exception(f"Problem occurred when sending modules to be imported from MPI Rank 0 to MPI Rank {i}")
- 
-            try:
-                logger.debug(f"MPI Rank {i} gets {batch_size} number of simulation configurations")
-                # Then, send the simulation batch
-                comm.send(batch_creator.ranks[i*batch_size:(i+1)*batch_size], dest=i, tag=MPITransferTag.SIMBATCH)
-            except:
-                logger.exception(f"Problem occurred when sending simulation configurations batch from MPI Rank 0 to MPI Rank {i}")
 
-    logger.debug(f"Rank {rank} begins execution of simulation batches")
-    # Execute the simulation
-    multiple_simulations_partial(batch_creator.ranks[:batch_size])
+        # Rank 0 only dispatches; every other rank requests the next
+        # simulation configuration when it is idle and gets None when there
+        # are no more
+        logger.debug(f"Rank {rank} dispatches {len(sim_batches)} simulation configurations")
+        status = MPI.Status()
+        next_batch = 0
+        active_workers = total_procs - 1
+        while active_workers > 0:
+
+            if not comm.Iprobe(source=MPI.ANY_SOURCE, tag=MPITransferTag.REQUEST, status=status):
+                sleep(DISPATCH_POLL_INTERVAL)
+                continue
+
+            worker = status.Get_source()
+            comm.recv(source=worker, tag=MPITransferTag.REQUEST)
+
+            if next_batch < len(sim_batches):
+                try:
+                    logger.debug(f"MPI Rank {worker} gets simulation configuration {sim_batches[next_batch][0]}")
+                    comm.send(sim_batches[next_batch], dest=worker, tag=MPITransferTag.SIMBATCH)
+                except:
+                    logger.exception(f"Problem occurred when sending a simulation configuration from MPI Rank 0 to MPI Rank {worker}")
+                next_batch += 1
+            else:
+                comm.send(None, dest=worker, tag=MPITransferTag.SIMBATCH)
+                active_workers -= 1
+
+    else:
+        logger.debug(f"Rank {rank} begins execution of simulation batches")
+        # Execute the simulation
+        multiple_simulations_partial(sim_batches)
 
     logger.debug(f"Rank {rank} finished execution without any errors")
 
@@ -71,7 +103,12 @@ else:
         import_module(mod)
 
     logger.debug(f"Rank {rank} begins execution of simulation batches")
-    # Execute the simulation
-    multiple_simulations_partial(comm.recv(source=0, tag=MPITransferTag.SIMBATCH))
+    # Request simulation configurations until there are no more
+    while True:
+        comm.send(None, dest=0, tag=MPITransferTag.REQUEST)
+        sim_batch = comm.recv(source=0, tag=MPITransferTag.SIMBATCH)
+        if sim_batch is None:
+            break
+        single_simulation_partial(sim_batch)
 
     logger.debug(f"Rank {rank} finished execution without any errors")
@@ -15,54 +15,83 @@ sys.path.append(os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..")
 ))
 
+from realsim.logger.animation import replay_animated_cluster
+from realsim.logger.gantt import write_png
+from realsim.segments import simulate_segmented
+from realsim.snapshot import load_snapshot, read_snapshot_header, save_snapshot
+from batch.cache import action_output_entry, copy_atomic
+from batch.ledger import record_completion
 from common.utils import define_logger, handler_and_formatter, envvar_bool_val, profiling_ctx
 logger = define_logger()
 
+def action_output(evt_logger, action):
+    """The file that an action of a patched logger writes or None if it does
+    not write one
+    """
+    if evt_logger.webui:
+        folders = {
+            "get_gantt_representation": ("gantt", "json"),
+            "get_workload": ("workloads", "csv"),
+            "get_waiting_queue_graph": ("waiting_queue", "json"),
+            "get_jobs_throughput": ("jobs_throughput", "json"),
+            "get_unused_cores_graph": ("unused_cores", "json"),
+            "get_animated_cluster": ("animated_cluster", "json")
+        }
+        if action not in folders:
+            return None
+        folder, extension = folders[action]
+        return os.path.abspath(f"{evt_logger.dir}/{folder}/input_{evt_logger.inp_idx}_scheduler_{evt_logger.sched_idx}.{extension}")
+
+    scheduler_name = evt_logger.scheduler.name.lower().replace(' ', '_')
+    if action == "get_gantt_representation":
+        return os.path.abspath(f"{evt_logger.img_dir}/input_{evt_logger.inp_idx}_{scheduler_name}.png")
+    elif action == "get_workload":
+        return os.path.abspath(f"{evt_logger.workload_dir}/workload_{evt_logger.sim_idx}_{scheduler_name}.{evt_logger.workload_format}")
+    return None
+
 def __get_gantt_representation(self):
-    res = self.__class__.get_gantt_representation(self) # Have to call this way to avoid infinite recursion
-    fig = from_json(res)
-    fig.update_layout(width=2048, height=1024)
+    # The plot is rasterized directly instead of rendering the figure
+    image = self.get_gantt_image(width=2048, height=1024)
 
-    output_path = os.path.abspath(f"{self.img_dir}")
-    os.makedirs(output_path, exist_ok=True)
-    fig.write_image(f"{output_path}/input_{self.inp_idx}_{self.scheduler.name.lower().replace(' ', '_')}.png")
+    filename = action_output(self, "get_gantt_representation")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    write_png(filename, image)
 
 def __get_webui_gantt_representation(self):
     res = self.__class__.get_gantt_representation(self) # Have to call this way to avoid infinite recursion
-    output_path = os.path.abspath(f"{self.dir}/gantt")
-    os.makedirs(output_path, exist_ok=True)
-    filename = f"{output_path}/input_{self.inp_idx}_scheduler_{self.sched_idx}.json"
+    filename = action_output(self, "get_gantt_representation")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
     
     with open(filename, "w") as fd:
         json.dump(res, fd)
 
 def __get_webui_workload(self):
-    res = self.__class__.get_workload(self)
-
-    output_path = os.path.abspath(f"{self.dir}/workloads")
-    os.makedirs(output_path, exist_ok=True)
+    filename = action_output(self, "get_workload")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
 
-    with open(f"{output_path}/input_{self.inp_idx}_scheduler_{self.sched_idx}.csv", "w") as fd:
-        fd.write(res)
+    with open(filename, "w") as fd:
+        self.write_workload(fd)
 
 def __get_workload(self):
-    res = self.__class__.get_workload(self)
-
-    output_path = os.path.abspath(f"{self.workload_dir}")
-    os.makedirs(output_path, exist_ok=True)
-
-    with open(f"{output_path}/workload_{self.sim_id}_{self.scheduler.name.lower().replace(' ', '_')}.csv", "w") as fd:
-        fd.write(res)
+    filename = action_output(self, "get_workload")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+
+    if self.workload_format == "npy":
+        self.save_workload_array(filename)
+    elif self.workload_format == "csv":
+        with open(filename, "w") as fd:
+            self.write_workload(fd)
+    else:
+        raise RuntimeError(f"Unknown workload format: {self.workload_format}")
 
 def __get_animated_cluster(self):
     res = self.__class__.get_animated_cluster(self)
-    fig = from_json(res)
+    fig = from_json(replay_animated_cluster(res))
     fig.show()
 
 def __get_webui_waiting_queue_graph(self):
-    output_path = os.path.abspath(f"{self.dir}/waiting_queue")
-    os.makedirs(output_path, exist_ok=True)
-    filename = f"{output_path}/input_{self.inp_idx}_scheduler_{self.sched_idx}.json"
+    filename = action_output(self, "get_waiting_queue_graph")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
 
     res = self.__class__.get_waiting_queue_graph(self) # Have to call this way to avoid infinite recursion
     checks, num_of_jobs = res
@@ -81,9 +110,8 @@ def __get_webui_waiting_queue_graph(self):
         json.dump(fig.to_json(), fd)
 
 def __get_webui_jobs_throughput_graph(self):
-    output_path = os.path.abspath(f"{self.dir}/jobs_throughput")
-    os.makedirs(output_path, exist_ok=True)
-    filename = f"{output_path}/input_{self.inp_idx}_scheduler_{self.sched_idx}.json"
+    filename = action_output(self, "get_jobs_throughput")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
 
     res = self.__class__.get_jobs_throughput(self) # Have to call this way to avoid infinite recursion
     checks, num_of_jobs = res
@@ -102,9 +130,8 @@ def __get_webui_jobs_throughput_graph(self):
         json.dump(fig.to_json(), fd)
 
 def __get_webui_unused_cores_graph(self):
-    output_path = os.path.abspath(f"{self.dir}/unused_cores")
-    os.makedirs(output_path, exist_ok=True)
-    filename = f"{output_path}/input_{self.inp_idx}_scheduler_{self.sched_idx}.json"
+    filename = action_output(self, "get_unused_cores_graph")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
 
     res = self.__class__.get_unused_cores_graph(self) # Have to call this way to avoid infinite recursion
     checks, num_of_cores = res
@@ -124,17 +151,19 @@ def __get_webui_unused_cores_graph(self):
 
 def __get_webui_animated_cluster(self):
     res = self.__class__.get_animated_cluster(self) # Have to call this way to avoid infinite recursion
-    output_path = os.path.abspath(f"{self.dir}/animated_cluster")
-    os.makedirs(output_path, exist_ok=True)
-    filename = f"{output_path}/input_{self.inp_idx}_scheduler_{self.sched_idx}.json"
+    filename = action_output(self, "get_animated_cluster")
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
     print(filename)
     
     with open(filename, "w") as fd:
         json.dump(res, fd)
 
-def patch(evt_logger, extra_features):
+def set_features(evt_logger, extra_features):
     for arg, val in extra_features:
         evt_logger.__dict__[arg] = val
+
+def patch(evt_logger, extra_features):
+    set_features(evt_logger, extra_features)
     
     if evt_logger.webui:
         evt_logger.get_gantt_representation = MethodType(__get_webui_gantt_representation, evt_logger)
@@ -152,55 +181,115 @@ def pad_message(msg):
     DEFAULT_MSG_LEN = 1024
     return msg + b'\0' * (DEFAULT_MSG_LEN- len(msg))
 
-def single_simulation(sim_batch, server_ipaddr, server_port, webui=False):
-    """The function that defines the simulation loop and actions
+def single_simulation(sim_batch, server_ipaddr, server_port, webui=False, ledger_path=None):
+    """The function that defines the simulation loop and actions; a finished
+    simulation is recorded in the completion ledger of the project if given
     """
 
     sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     sock.connect((server_ipaddr, server_port))
     sock.setblocking(False)
 
-    sim_idx, inp_idx, sched_idx, database, cluster, scheduler, evt_logger, compengine, actions, extra_features = sim_batch
+    sim_idx, inp_idx, sched_idx, database, cluster, scheduler, evt_logger, compengine, actions, extra_features, sim_hash, cache_path = sim_batch
 
     comp_logger = logger.getChild("compengine")
     if envvar_bool_val("ELiSE_DEBUG"):
         handler_and_formatter(comp_logger)
     compengine.debug_logger = comp_logger
 
-    logger.debug(f"Setting up the cluster, scheduler and event logger, (input[{inp_idx}], scheduler[{sched_idx}], simulation[{sim_idx}])")
+    # Progress counter; counted before a snapshot replaces the database
+    total_jobs = database.get_jobs_num()
 
-    cluster.setup()
-    scheduler.setup()
-    evt_logger.setup()
-
-    # Progress counter
-    total_jobs = len(database.preloaded_queue)
+    # The options of the actions; only the values are set before the
+    # simulation, because the patched methods of a logger can not be stored
+    # in a snapshot
+    if actions != []:
+        extra_features.append(("sim_idx", sim_idx))
+        extra_features.append(("inp_idx", inp_idx))
+        extra_features.append(("sched_idx", sched_idx))
+        extra_features.append(("webui", webui))
+        set_features(evt_logger, extra_features)
+    options = dict(extra_features)
+
+    # A simulation with the same content already finished and the files of
+    # its actions are copied from the cache; the finished state is restored
+    # only for the actions whose files are not stored. Otherwise resume the
+    # simulation from its last snapshot if there is one
+    checkpoint_path = compengine.checkpoint_path
+    cached = cache_path is not None and os.path.exists(cache_path)
+    outputs = dict()
+    for action in actions:
+        output_path = action_output(evt_logger, action)
+        if output_path is not None and cache_path is not None:
+            outputs[action] = (output_path, action_output_entry(cache_path, action, options))
+    stored = [action for action, (_, entry) in outputs.items() if cached and os.path.exists(entry)]
+    restored = cached and any(action not in stored for action in actions)
+
+    resumed = not cached and checkpoint_path is not None and os.path.exists(checkpoint_path)
+    if cached:
+        header = read_snapshot_header(cache_path)
+    if restored or resumed:
+        snapshot_path = cache_path if cached else checkpoint_path
+        logger.debug(f"Restoring simulation[{sim_idx}] from the snapshot {snapshot_path}")
+        compengine = load_snapshot(snapshot_path)
+        database, cluster, scheduler, evt_logger = compengine.db, compengine.cluster, compengine.scheduler, compengine.logger
+        compengine.debug_logger = comp_logger
+    elif not cached:
+        logger.debug(f"Setting up the cluster, scheduler and event logger, (input[{inp_idx}], scheduler[{sched_idx}], simulation[{sim_idx}])")
+
+        cluster.setup()
+        scheduler.setup()
+        evt_logger.setup()
 
     # Start timer
     start_time = time()
     
+    def send_progress(finished_jobs):
+        nonlocal sock
+        progress_perc = 100 * finished_jobs / total_jobs
+        msg_to_send = pad_message(json.dumps( {"sim_id": sim_idx, "progress_perc": progress_perc} ).encode())
+        try:
+            sock.send(msg_to_send)
+        except:
+            logger.exception("The socket couldn't connect to the progress server. It will be reconnecting")
+            sock.close()
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.connect((server_ipaddr, server_port))
+            sock.setblocking(False)
+
     with profiling_ctx(sim_idx, scheduler.name, logger):
 
-        while database.preloaded_queue != [] or cluster.waiting_queue != [] or cluster.execution_list != []:
+        if cached:
+            # The simulation finished in an earlier run
+            send_progress(header["finished jobs"])
+
+        elif compengine.split_workers > 1 and not resumed:
+            # The parts of the trace between drain points are simulated by a
+            # pool of processes and stitched back together
             try:
-                compengine.sim_step()
+                segments = simulate_segmented(database, cluster, scheduler, evt_logger, compengine.split_workers, send_progress)
+                logger.debug(f"The simulation was split in {segments} segments")
             except:
-                logger.exception("An error occurred during the execution of the simulation")
+                logger.exception("The split simulation failed; the trace will be simulated at once")
 
-            progress_perc = 100 * (1 - (len(database.preloaded_queue) + len(cluster.waiting_queue) + len(cluster.execution_list)) / total_jobs)
-            msg_to_send = pad_message(json.dumps( {"sim_id": sim_idx, "progress_perc": progress_perc} ).encode())
+        while not cached and (len(database.preloaded_queue) > 0 or cluster.waiting_queue != [] or cluster.execution_list != []):
             try:
-                sock.send(msg_to_send)
+                compengine.sim_step()
             except:
-                logger.exception("The socket couldn't connect to the progress server. It will be reconnecting")
-                sock.close()
-                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                sock.connect((server_ipaddr, server_port))
-                sock.setblocking(False)
+                logger.exception("An error occurred during the execution of the simulation")
+
+            send_progress(cluster.finished_jobs_num)
+
+    # Store the finished simulation in the cache
+    if cache_path is not None and not cached:
+        try:
+            save_snapshot(compengine, cache_path)
+        except:
+            logger.exception(f"The simulation[{sim_idx}] could not be stored in the cache")
     
     # Calculate the real time and simulated time
     real_time = time() - start_time
-    sim_time = cluster.makespan
+    sim_time = header["makespan"] if cached else cluster.makespan
 
     # Send the times back to the progress server
     msg_to_send = pad_message(json.dumps( {"sim_id": sim_idx, "inp_id": inp_idx, "sched_id": sched_idx, "scheduler": scheduler.name, "real_time": real_time, "sim_time": sim_time} ).encode())
@@ -229,19 +318,52 @@ def single_simulation(sim_batch, server_ipaddr, server_port, webui=False):
     # If there are actions provided for this rank
     if actions != []:
         # Overwrite event logger's interface
-        extra_features.append(("sim_idx", sim_idx))
-        extra_features.append(("inp_idx", inp_idx))
-        extra_features.append(("sched_idx", sched_idx))
-        extra_features.append(("webui", webui))
         patch(evt_logger, extra_features)
 
         # Perform actions upon completion
         for action in actions:
+            if action in stored:
+                output_path, entry = outputs[action]
+                copy_atomic(entry, output_path)
+                continue
+
             getattr(evt_logger, action)()
+
+            # Store the files of the action with the simulation in the cache
+            if action in outputs and os.path.exists(outputs[action][0]):
+                output_path, entry = outputs[action]
+                try:
+                    copy_atomic(output_path, entry)
+                except:
+                    logger.exception(f"The output of {action} of simulation[{sim_idx}] could not be stored in the cache")
+
+    # The simulation and its actions finished
+    if ledger_path is not None:
+        record_completion(ledger_path, sim_idx, sim_hash, inp_idx=inp_idx, sched_idx=sched_idx,
+                          scheduler=scheduler.name, real_time=real_time, sim_time=sim_time)
+
+    # There is nothing left to resume
+    if checkpoint_path is not None and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
     
 
-def multiple_simulations(sim_batches, server_ipaddr, server_port, webui=False):
+def expected_cost(sim_batch) -> int:
+    """Estimate how long a simulation takes by its number of jobs times the
+    number of nodes of its cluster; restoring a cached result costs nothing
+    """
+    database, cluster, cache_path = sim_batch[3], sim_batch[4], sim_batch[11]
+    if cache_path is not None and os.path.exists(cache_path):
+        return 0
+    return database.get_jobs_num() * cluster.nodes
+
+def longest_first(sim_batches):
+    """Order the simulations by decreasing expected cost so that the longest
+    ones do not start last while the other workers are idle
+    """
+    return sorted(sim_batches, key=expected_cost, reverse=True)
+
+def multiple_simulations(sim_batches, server_ipaddr, server_port, webui=False, ledger_path=None):
     for sim_batch in sim_batches:
         logger.debug(f"Starting single simulation with id {sim_batch[0]}")
-        single_simulation(sim_batch, server_ipaddr, server_port, webui)
+        single_simulation(sim_batch, server_ipaddr, server_port, webui, ledger_path)
         logger.debug(f"Finished single simulation with id {sim_batch[0]}")
@@ -1,5 +1,4 @@
 import argparse
-from math import ceil
 from multiprocessing import cpu_count
 import os
 from pathlib import Path
@@ -11,6 +10,7 @@ ELiSE_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 sys.path.append(ELiSE_ROOT)
 
 from batch.batch_utils import BatchCreator
+from batch.ledger import clear_ledger
 from common.utils import define_logger, is_bundled, process_name, get_executable
 
 logger = define_logger()
@@ -45,27 +45,6 @@ def local_or_hpc_env() -> int:
 
     return total_cores
 
-def calculate_for_less_avail_cores(sim_configs_num: int, avail_cores: int) -> tuple[int, int]:
-    """
-    Calculate the number of processes and batch size needed to process a given number of simulation configurations
-    with less available cores.
-
-    Args:
-        sim_configs_num (int): The total number of simulation configurations.
-        avail_cores (int): The total number of available cores for computation.
-
-    Returns:
-        tuple: A tuple containing two values. The first value is the total number of processes needed, and the second
-               value is the batch size used to calculate this number.
-    """
-    batch_size = ceil(sim_configs_num / avail_cores)
-    total_procs = 0
-    while sim_configs_num > 0:
-        sim_configs_num -= batch_size
-        total_procs += 1
-
-    return total_procs, batch_size
-
 def spawn_progress_server(server_ipaddr: str, server_port: int, connections: int, export_reports: str, webui: bool) -> subprocess.Popen:
     """
     Starts a progress server process.
@@ -112,7 +91,7 @@ def spawn_progress_server(server_ipaddr: str, server_port: int, connections: int
 
     return sim_progress_proc
 
-def spawn_simulation_runs(schematic_file: str, provider: str, server_ipaddr: str, server_port: int, sim_configs_num: int, webui: bool) -> subprocess.Popen:
+def spawn_simulation_runs(schematic_file: str, provider: str, server_ipaddr: str, server_port: int, sim_configs_num: int, webui: bool, resume: bool = False) -> subprocess.Popen:
     """
     Spawn multiple simulation runs in parallel on localhost and optionally to remote machines using MPI.
 
@@ -125,6 +104,7 @@ def spawn_simulation_runs(schematic_file: str, provider: str, server_ipaddr: str
         server_ipaddr (str): IP address of the progress server.
         server_port (int): Port number used for communication with the progress server.
         sim_configs_num (int): Number of simulation configurations.
+        resume (bool): Skip the simulation configurations that finished in a previous submission.
 
     Returns:
         subprocess.Popen: The process object representing the submission command execution.
@@ -133,16 +113,16 @@ def spawn_simulation_runs(schematic_file: str, provider: str, server_ipaddr: str
     # Calculate the number of available cores under the context
     avail_cores = local_or_hpc_env()
 
-    # Calculate the number of processes and batch size based on available cores and simulation configurations
-    if avail_cores >= sim_configs_num:
-        total_procs = sim_configs_num
-        batch_size = 1
-    else:
-        total_procs, batch_size = calculate_for_less_avail_cores(sim_configs_num, avail_cores)
+    # Every process pulls the next simulation configuration when it is idle,
+    # so there is no need for more processes than configurations
+    total_procs = min(avail_cores, sim_configs_num)
 
     total_procs_str = f"One process" if total_procs == 1 else f"{total_procs} parallel processes"
-    batch_str = f"a single simulation configuration" if batch_size == 1 else f"{batch_size} simulation configurations"
-    logger.debug(f"{total_procs_str} for {batch_str}")
+    logger.debug(f"{total_procs_str} for {sim_configs_num} simulation configurations")
+
+    # With more than one MPI rank, rank 0 only dispatches the simulation
+    # configurations to the others
+    mpi_procs = total_procs + 1 if total_procs > 1 else 1
 
     # Build the submission script depending on the provider
     submission_cmd = list()
@@ -155,7 +135,7 @@ def spawn_simulation_runs(schematic_file: str, provider: str, server_ipaddr: str
         else:
             run_mp_path = root_path / "batch" / process_name("run_mp")
         exe = get_executable(run_mp_path)
-        submission_cmd = exe + [schematic_file, str(total_procs), str(batch_size), server_ipaddr, str(server_port)]
+        submission_cmd = exe + [schematic_file, str(total_procs), server_ipaddr, str(server_port)]
 
     elif provider == "openmpi":
         logger.debug("Using OpenMPI as backend")
@@ -166,7 +146,7 @@ def spawn_simulation_runs(schematic_file: str, provider: str, server_ipaddr: str
         else:
             run_mpi_path = root_path / "batch" / process_name("run_mpi")
         exe = get_executable(run_mpi_path)
-        submission_cmd = ["mpirun", "--bind-to", "none", "--oversubscribe", "-np", str(total_procs)] + exe + [schematic_file, str(batch_size), server_ipaddr, str(server_port)]
+        submission_cmd = ["mpirun", "--bind-to", "none", "--oversubscribe", "-np", str(mpi_procs)] + exe + [schematic_file, server_ipaddr, str(server_port)]
 
     elif provider == "intelmpi":
         logger.debug("Using IntelMPI as backend")
@@ -180,7 +160,7 @@ def spawn_simulation_runs(schematic_file: str, provider: str, server_ipaddr: str
         exe = get_executable(run_mpi_path)
         # Intel MPI supports oversubscription by default
         # Not defining a bind policy places the threads randomly
-        submission_cmd = ["mpiexec", "-np", str(total_procs)] + exe + [schematic_file, str(batch_size), server_ipaddr, str(server_port)]
+        submission_cmd = ["mpiexec", "-np", str(mpi_procs)] + exe + [schematic_file, server_ipaddr, str(server_port)]
     
     # Handle WebUI
     if webui:
@@ -188,6 +168,9 @@ def spawn_simulation_runs(schematic_file: str, provider: str, server_ipaddr: str
     else:
         submission_cmd.append("0")
 
+    # Handle resuming the project
+    submission_cmd.append("1" if resume else "0")
+
     logger.debug(f"Submission cmdline: {' '.join(submission_cmd)}")
 
     logger.debug(f"Starting the simulation runs")
@@ -212,6 +195,7 @@ def execute_simulation(cmdargs=None):
     parser.add_argument("-p", "--provider", choices=supported_providers, default="mp", help="Define the provider for parallelizing tasks")
     parser.add_argument("--export_reports", default="", type=str, help="Provde a directory to export reports for each scheduler")
     parser.add_argument("--webui", default=False, action="store_true")
+    parser.add_argument("--resume", default=False, action="store_true", help="Run only the simulation configurations that did not finish or changed since the last submission")
 
     if cmdargs is not None:
         args = parser.parse_args(cmdargs)
@@ -222,13 +206,22 @@ def execute_simulation(cmdargs=None):
     provider = args.provider
     export_reports = args.export_reports
     webui = args.webui
+    resume = args.resume
 
     # Calculate the number of needed cores to run all the simulations in parallel
     batch_creator = BatchCreator(schematic_file)
 
-    sim_configs_num = batch_creator.get_sim_configs_num()
+    # A new submission starts the completion ledger of the project over
+    if not resume:
+        clear_ledger(batch_creator.ledger_path)
+
+    sim_configs_num = len(batch_creator.get_pending_sims(resume))
     logger.debug(f"The total number of simulation configurations is {sim_configs_num}")
 
+    if sim_configs_num == 0:
+        logger.debug("All the simulation configurations have already finished")
+        return
+
     # Get the IP address of the local machine that will launch both the progress server and the simulation runs
     # This will be broadcasted to the simulation run workers to report to the progress server
     server_ipaddr, server_port = socket.gethostbyname(socket.gethostname()), 54321
@@ -237,7 +230,7 @@ def execute_simulation(cmdargs=None):
     sim_progress_proc = spawn_progress_server(server_ipaddr, server_port, sim_configs_num, export_reports, webui)
 
     # And then spawn the simulation runs
-    sim_run_proc = spawn_simulation_runs(schematic_file, provider, server_ipaddr, server_port, sim_configs_num, webui)
+    sim_run_proc = spawn_simulation_runs(schematic_file, provider, server_ipaddr, server_port, sim_configs_num, webui, resume)
 
     # We first wait for the simulation runs to finish
     sim_run_proc.wait()
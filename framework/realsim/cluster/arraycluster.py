@@ -0,0 +1,124 @@
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
+
+import numpy as np
+from procset import ProcSet
+from typing import Optional
+
+from realsim.cluster.cluster import Cluster
+from realsim.cluster.host import Host
+
+
+def procset_from_ids(ids: np.ndarray) -> ProcSet:
+    """Build a ProcSet from a sorted array of core ids
+    """
+    if len(ids) == 0:
+        return ProcSet()
+
+    # Split the ids wherever they stop being contiguous
+    breaks = np.flatnonzero(np.diff(ids) != 1)
+    infs = np.concatenate(([ids[0]], ids[breaks + 1])).tolist()
+    sups = np.concatenate((ids[breaks], [ids[-1]])).tolist()
+
+    return ProcSet(*zip(infs, sups))
+
+
+class ArrayHost(Host):
+    """A host whose cores live in the arrays of an ArrayCluster. The processor
+    sets of the sockets are produced on demand.
+    """
+
+    def __init__(self, cluster: 'ArrayCluster', position: int):
+
+        self.socket_conf = cluster.socket_conf
+
+        # Row of the host inside the arrays of the cluster
+        self.cluster = cluster
+        self.position = position
+
+        # Id of the first core of the host
+        self.first_core_id = position * sum(self.socket_conf) + 1
+
+        # Set starting state of a host
+        self.state = Host.IDLE
+
+        # Get references of the jobs running on the host
+        self.jobs: dict[int, list[ProcSet]] = dict()
+
+    def __socket_ids(self, socket: int) -> np.ndarray:
+        """Core ids of the free cores of a socket
+        """
+        start = self.cluster.socket_offsets[socket]
+        stop = start + self.socket_conf[socket]
+        free = np.flatnonzero(self.cluster.cores[self.position, start:stop])
+        return free + (self.first_core_id + start)
+
+    @property
+    def sockets(self) -> list[ProcSet]:
+        return [procset_from_ids(self.__socket_ids(i))
+                for i in range(len(self.socket_conf))]
+
+    def get_idle_cores_num(self) -> int:
+        return int(self.cluster.free_per_socket[self.position].sum())
+
+    def get_idle_cores_per_socket(self) -> tuple:
+        return tuple(self.cluster.free_per_socket[self.position].tolist())
+
+    def get_free_psets(self, socket_conf: tuple) -> list[ProcSet]:
+        return [procset_from_ids(self.__socket_ids(i)[:cores])
+                for i, cores in enumerate(socket_conf)]
+
+    def __set_cores(self, psets: list[ProcSet], free: bool) -> None:
+        for i, pset in enumerate(psets):
+            for interval in pset.intervals():
+                start = interval.inf - self.first_core_id
+                stop = interval.sup - self.first_core_id + 1
+                self.cluster.cores[self.position, start:stop] = free
+            self.cluster.free_per_socket[self.position, i] += len(pset) if free else -len(pset)
+
+    def allocate(self, psets: list[ProcSet]) -> None:
+        self.__set_cores(psets, False)
+
+    def release(self, psets: list[ProcSet]) -> None:
+        self.__set_cores(psets, True)
+
+
+class ArrayCluster(Cluster):
+    """Cluster that stores the core occupancy of its hosts in NumPy arrays:
+    the free cores per socket in a (nodes, sockets) array and a bitmap of the
+    free cores in a (nodes, cores per node) array. Searching for suitable hosts
+    is vectorized over all the hosts and allocating or releasing cores only
+    touches slices of the arrays.
+    """
+
+    def __init__(self, nodes: int, socket_conf: tuple):
+
+        # Number of free cores of each socket of each host
+        self.free_per_socket = np.tile(np.array(socket_conf, dtype=np.int32), (nodes, 1))
+
+        # Bitmap of the free cores of each host
+        self.cores = np.ones((nodes, sum(socket_conf)), dtype=bool)
+
+        # Index of the first core of each socket inside a host's row
+        self.socket_offsets = np.concatenate(([0], np.cumsum(socket_conf)[:-1])).tolist()
+
+        Cluster.__init__(self, nodes, socket_conf)
+
+        # The free cores per socket array takes the place of the hosts index
+        self.hosts_index = dict()
+        self.hosts_free_cores = list()
+
+    def create_host(self, position: int) -> Host:
+        return ArrayHost(self, position)
+
+    def update_hosts_index(self, hostname: str) -> None:
+        pass
+
+    def get_suitable_hosts(self, socket_conf: tuple, num_of_hosts: Optional[int] = None) -> list[str]:
+        mask = np.all(self.free_per_socket >= np.array(socket_conf), axis=1)
+        positions = np.flatnonzero(mask)
+        if num_of_hosts is not None:
+            positions = positions[:num_of_hosts]
+
+        return [self.hostnames[position] for position in positions.tolist()]
@@ -2,9 +2,15 @@ import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../../')))
 
+from realsim.cluster.endorder import EndOrder
 from realsim.cluster.host import Host
 from realsim.jobs.jobs import Job
+from bisect import bisect_left, insort
+from heapq import merge
+from itertools import islice
 from math import inf
+from procset import ProcSet
+from typing import Iterator, Optional
 
 
 class Cluster:
@@ -30,10 +36,29 @@ class Cluster:
         # Hosts where the hostname is a the string 'host' followed by a number
         _cores_per_node = sum(socket_conf)
         self.hosts: dict[str, Host] = {
-                f"host{i}": Host(socket_conf, i * _cores_per_node + 1)
+                f"host{i}": self.create_host(i)
                 for i in range(nodes)
         }
 
+        # Position of each host in the cluster
+        self.hostnames: list[str] = list(self.hosts.keys())
+        self.host_positions: dict[str, int] = {
+                hostname: i for i, hostname in enumerate(self.hostnames)
+        }
+
+        # Index of the hosts bucketed by their number of free cores per
+        # socket; each bucket keeps the positions of its hosts sorted
+        self.hosts_index: dict[tuple, list[int]] = {
+                tuple(socket_conf): list(range(nodes))
+        }
+        self.hosts_free_cores: list[tuple] = [tuple(socket_conf)] * nodes
+
+        # The sorted names of the jobs executing on each host; hosts with the
+        # same occupancy are interchangeable for co-scheduling decisions
+        self.host_occupancy: dict[str, tuple[str, ...]] = {
+                hostname: tuple() for hostname in self.hostnames
+        }
+
         # Number of current free cores
         self.free_cores = self.nodes * _cores_per_node
 
@@ -43,24 +68,150 @@ class Cluster:
         # Changing number of idle cores
         self.idle_cores = self.nodes * _cores_per_node
 
+        # Changing number of idle hosts
+        self.idle_hosts_num = self.nodes
+
         # Waiting queue size
         self.queue_size = inf
         # The queue of waiting jobs
         self.waiting_queue: list[Job] = list()
         # The list of executing jobs
         self.execution_list: list[Job] = list()
+        # The executing jobs by their id
+        self.execution_index: dict[int, Job] = dict()
+        # The executing jobs ordered by their expected end time (start time
+        # plus wall time) as (end time, sequence number, job id) entries,
+        # along with the hosts each one frees
+        self.running_by_end: EndOrder = EndOrder()
+        self.running_keys: dict[int, tuple[float, int, int]] = dict()
+        self.running_counter: int = 0
 
         # Important counters #
 
         # Job id counter
         self.id_counter: int = 0
+
+        # Number of jobs that finished execution
+        self.finished_jobs_num: int = 0
+
+        # State versions; each counter is bumped whenever jobs arrive in the
+        # waiting queue, get deployed or release their resources
+        self.arrivals_version: int = 0
+        self.deploys_version: int = 0
+        self.releases_version: int = 0
         
         # The total execution time
         # of a cluster
         self.makespan: float = 0
 
+    def create_host(self, position: int) -> Host:
+        """Create the host at a certain position of the cluster
+        """
+        return Host(self.socket_conf, position * sum(self.socket_conf) + 1)
+
     def setup(self):
         self.execution_list = list()
+        self.execution_index = dict()
+        self.running_by_end = EndOrder()
+        self.running_keys = dict()
+        self.running_counter = 0
+
+    def get_state_version(self) -> dict[str, int]:
+        return {
+                "arrivals": self.arrivals_version,
+                "deploys": self.deploys_version,
+                "releases": self.releases_version
+        }
+
+    def set_host_state(self, hostname: str, state: int) -> None:
+        """Change the state of a host and keep count of the idle hosts
+        """
+        host = self.hosts[hostname]
+        if host.state == Host.IDLE:
+            self.idle_hosts_num -= 1
+        if state == Host.IDLE:
+            self.idle_hosts_num += 1
+        host.state = state
+
+    def add_running_job(self, job: Job) -> None:
+        """Index an executing job by its expected end time
+        """
+        key = (job.start_time + job.wall_time, self.running_counter, job.job_id)
+        self.running_counter += 1
+        self.running_by_end.add(key, len(job.assigned_hosts))
+        self.running_keys[job.job_id] = key
+
+    def remove_running_job(self, job: Job) -> None:
+        self.running_by_end.remove(self.running_keys.pop(job.job_id))
+
+    def get_running_jobs_by_end(self) -> Iterator[Job]:
+        """Iterate over the executing jobs by increasing expected end time;
+        jobs with the same expected end time keep their deployment order
+        """
+        for _, _, job_id in self.running_by_end:
+            yield self.execution_index[job_id]
+
+    def get_shadow_job(self, hosts_num: int) -> Optional[Job]:
+        """Return the first executing job, by expected end time, after which
+        at least hosts_num hosts have been freed or None if there is none
+        """
+        shadow = self.running_by_end.shadow(hosts_num)
+        if shadow is None:
+            return None
+        return self.execution_index[shadow[0][2]]
+
+    def update_hosts_index(self, hostname: str) -> None:
+        """Move a host to the bucket of its current free cores per socket
+        """
+        position = self.host_positions[hostname]
+        old_key = self.hosts_free_cores[position]
+        new_key = self.hosts[hostname].get_idle_cores_per_socket()
+
+        if old_key == new_key:
+            return
+
+        bucket = self.hosts_index[old_key]
+        del bucket[bisect_left(bucket, position)]
+        if bucket == []:
+            self.hosts_index.pop(old_key)
+
+        insort(self.hosts_index.setdefault(new_key, list()), position)
+        self.hosts_free_cores[position] = new_key
+
+    def update_host_occupancy(self, hostname: str) -> None:
+        """Recalculate the occupancy of a host after its jobs changed
+        """
+        self.host_occupancy[hostname] = tuple(sorted(
+            self.execution_index[job_id].job_name for job_id in self.hosts[hostname].jobs
+        ))
+
+    def allocate_cores(self, hostname: str, psets: list[ProcSet]) -> None:
+        """Remove the processor sets from the free cores of a host
+        """
+        self.hosts[hostname].allocate(psets)
+        self.idle_cores -= sum([len(pset) for pset in psets])
+        self.update_hosts_index(hostname)
+
+    def release_cores(self, hostname: str, psets: list[ProcSet]) -> None:
+        """Return the processor sets back to the free cores of a host
+        """
+        self.hosts[hostname].release(psets)
+        self.idle_cores += sum([len(pset) for pset in psets])
+        self.update_hosts_index(hostname)
+
+    def get_suitable_hosts(self, socket_conf: tuple, num_of_hosts: Optional[int] = None) -> list[str]:
+        """Return the names of the hosts, in cluster order, that have enough
+        free cores under a socket configuration. If num_of_hosts is given then
+        stop after finding that many hosts.
+        """
+        buckets = [bucket for free_cores, bucket in self.hosts_index.items()
+                   if all(free >= req for free, req in zip(free_cores, socket_conf))]
+
+        positions = merge(*buckets)
+        if num_of_hosts is not None:
+            positions = islice(positions, num_of_hosts)
+
+        return [self.hostnames[position] for position in positions]
 
     def get_idle_cores(self) -> int:
         return self.idle_cores
@@ -0,0 +1,128 @@
+"""
+The executing jobs ordered by their expected end time, along with the number
+of nodes that each one frees when it finishes. Schedulers that backfill ask for
+the first job by which enough nodes are freed for the head of the waiting
+queue, its shadow time.
+
+The entries are kept sorted in blocks of bounded size and a Fenwick tree holds
+the nodes freed by each block, so an entry is added or removed and the shadow
+job is found in logarithmic time plus the scan of a single block.
+"""
+
+from bisect import bisect_left
+from itertools import chain
+from typing import Iterator, Optional
+
+
+class EndOrder:
+
+    # Blocks are split when they grow past twice this size
+    BLOCK_SIZE = 64
+
+    def __init__(self):
+
+        # The sorted entries in consecutive blocks and the nodes freed by each
+        # entry in the same positions
+        self.blocks: list[list[tuple]] = list()
+        self.nodes: list[list[int]] = list()
+
+        # The last entry of each block
+        self.maxes: list[tuple] = list()
+
+        # Fenwick tree over the nodes freed by each block (1-based)
+        self.tree: list[int] = [0]
+
+        self.size: int = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[tuple]:
+        return chain.from_iterable(self.blocks)
+
+    def rebuild(self) -> None:
+        """Rebuild the Fenwick tree after the blocks changed
+        """
+        blocks_num = len(self.blocks)
+        self.tree = [0] * (blocks_num + 1)
+        for idx in range(1, blocks_num + 1):
+            self.tree[idx] += sum(self.nodes[idx - 1])
+            parent = idx + (idx & -idx)
+            if parent <= blocks_num:
+                self.tree[parent] += self.tree[idx]
+
+    def update_tree(self, block: int, nodes: int) -> None:
+        idx = block + 1
+        while idx < len(self.tree):
+            self.tree[idx] += nodes
+            idx += idx & -idx
+
+    def add(self, key: tuple, nodes: int) -> None:
+        """Add an entry that frees nodes when it ends
+        """
+        self.size += 1
+
+        if self.blocks == []:
+            self.blocks.append([key])
+            self.nodes.append([nodes])
+            self.maxes.append(key)
+            self.rebuild()
+            return
+
+        block = min(bisect_left(self.maxes, key), len(self.blocks) - 1)
+        idx = bisect_left(self.blocks[block], key)
+        self.blocks[block].insert(idx, key)
+        self.nodes[block].insert(idx, nodes)
+        self.maxes[block] = self.blocks[block][-1]
+
+        if len(self.blocks[block]) > 2 * EndOrder.BLOCK_SIZE:
+            half = len(self.blocks[block]) // 2
+            self.blocks[block + 1:block + 1] = [self.blocks[block][half:]]
+            self.nodes[block + 1:block + 1] = [self.nodes[block][half:]]
+            del self.blocks[block][half:]
+            del self.nodes[block][half:]
+            self.maxes[block:block + 1] = [self.blocks[block][-1], self.blocks[block + 1][-1]]
+            self.rebuild()
+        else:
+            self.update_tree(block, nodes)
+
+    def remove(self, key: tuple) -> None:
+        self.size -= 1
+
+        block = bisect_left(self.maxes, key)
+        idx = bisect_left(self.blocks[block], key)
+        del self.blocks[block][idx]
+        nodes = self.nodes[block].pop(idx)
+
+        if self.blocks[block] == []:
+            del self.blocks[block]
+            del self.nodes[block]
+            del self.maxes[block]
+            self.rebuild()
+        else:
+            self.maxes[block] = self.blocks[block][-1]
+            self.update_tree(block, -nodes)
+
+    def shadow(self, nodes: int) -> Optional[tuple[tuple, int]]:
+        """Return the first entry by whose end at least nodes are freed along
+        with the nodes freed by then, or None if all the entries free less
+        """
+        # Descend the tree to the last block before which less than nodes
+        # are freed
+        position, freed = 0, 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step > 0:
+            if position + step < len(self.tree) and freed + self.tree[position + step] < nodes:
+                position += step
+                freed += self.tree[position]
+            step >>= 1
+
+        if position == len(self.blocks):
+            return None
+
+        for key, key_nodes in zip(self.blocks[position], self.nodes[position]):
+            freed += key_nodes
+            if freed >= nodes:
+                return key, freed
+
+        return None
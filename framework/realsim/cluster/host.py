@@ -24,7 +24,7 @@ class Host:
         self.state = Host.IDLE
 
         # Get references of the jobs running on the host
-        self.jobs: dict[str, list[ProcSet]] = dict()
+        self.jobs: dict[int, list[ProcSet]] = dict()
  
     def get_idle_cores_num(self) -> int:
         _sum = 0
@@ -36,6 +36,36 @@ class Host:
     def get_used_cores_num(self) -> int:
         return sum(self.socket_conf) - self.get_idle_cores_num()
 
+    def get_idle_cores_per_socket(self) -> tuple:
+        return tuple([len(pset) for pset in self.sockets])
+
+    def get_free_psets(self, socket_conf: tuple) -> list[ProcSet]:
+        """Return the first free cores of each socket under a certain socket
+        configuration
+        """
+        psets: list[ProcSet] = list()
+        for socket_pset, cores in zip(self.sockets, socket_conf):
+            intervals = list()
+            for interval in socket_pset.intervals():
+                if cores <= 0:
+                    break
+                size = interval.sup - interval.inf + 1
+                if size <= cores:
+                    intervals.append((interval.inf, interval.sup))
+                else:
+                    intervals.append((interval.inf, interval.inf + cores - 1))
+                cores -= size
+            psets.append(ProcSet(*intervals))
+        return psets
+
+    def allocate(self, psets: list[ProcSet]) -> None:
+        for i, socket_pset in enumerate(self.sockets):
+            socket_pset -= psets[i]
+
+    def release(self, psets: list[ProcSet]) -> None:
+        for i, pset in enumerate(psets):
+            self.sockets[i] = self.sockets[i].union(pset)
+
 
 # Alias for Host class
 Node = Host
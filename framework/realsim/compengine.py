@@ -1,5 +1,7 @@
 # Utilities
+from collections import deque
 from math import inf, ceil
+from typing import Optional
 import numpy as np
 import os
 import sys
@@ -12,11 +14,13 @@ from common.utils import define_logger
 # Simulation
 from procset import ProcSet
 from realsim.jobs.jobs import Job, JobCharacterization, JobState
-from realsim.jobs.utils import deepcopy_list
+from realsim.jobs.utils import remove_job
 from realsim.database import Database
 from realsim.cluster.host import Host
 from realsim.cluster.cluster import Cluster
 from realsim.logger.logger import Logger
+from realsim.eventqueue import EventQueue
+from realsim.snapshot import save_snapshot
 import realsim.logger.logevts as evts
 
 
@@ -43,99 +47,160 @@ class ComputeEngine:
         self.logger.cluster = self.cluster
         self.logger.scheduler = self.scheduler
 
+        # Future finish events of the executing jobs
+        self.events = EventQueue()
+
+        # Ids of the executing jobs whose neighbors changed since their
+        # remaining time was last calculated
+        self.dirty_jobs: set[int] = set()
+
+        # The state version of the cluster when the last scheduling pass
+        # started, whether the pass left the waiting queue empty and the fewest
+        # processes requested by a job that arrived since
+        self.last_pass_version: Optional[dict[str, int]] = None
+        self.last_pass_queue_empty: bool = True
+        self.arrived_min_procs: float = inf
+
+        # The submit time of the first job in the workload
+        self.first_submit_time: float = 0
+
+        # Number of processes that simulate the parts of the workload between
+        # the instants the cluster drains (see realsim.segments)
+        self.split_workers: int = 1
+
+        # The file that the state of the simulation is stored to every
+        # checkpoint_interval simulated seconds (see realsim.snapshot)
+        self.checkpoint_path: Optional[str] = None
+        self.checkpoint_interval: float = inf
+        self.next_checkpoint: float = inf
+
         self.debug_logger = None
 
+    def set_checkpoints(self, path: Optional[str], interval: float = inf) -> None:
+        """Store a snapshot of the simulation to path every interval simulated
+        seconds; a None path disables the checkpoints
+        """
+        self.checkpoint_path = path
+        self.checkpoint_interval = interval if path is not None else inf
+        self.next_checkpoint = self.cluster.makespan + self.checkpoint_interval
+
+    def checkpoint(self) -> None:
+        # The next checkpoint is scheduled before saving so that a restored
+        # simulation does not store the same state again
+        while self.next_checkpoint <= self.cluster.makespan:
+            self.next_checkpoint += self.checkpoint_interval
+        save_snapshot(self, self.checkpoint_path)
+
     # Database preloaded queue setup
     def setup_preloaded_jobs(self) -> None:
         """Setup the preloaded jobs that are currently stored in the database
         """
 
+        # If the jobs are streamed then only the first job is read and the rest
+        # are read as the simulated time advances
+        if self.db.jobs_stream is not None:
+            first_job = next(self.db.jobs_stream, None)
+            if first_job is None:
+                return
+            self.db.preloaded_queue.append(first_job)
+
         # Sort jobs by their time they will be appearing in the waiting queue
-        self.db.preloaded_queue.sort(key=lambda job: job.submit_time)
+        self.db.preloaded_queue = deque(sorted(self.db.preloaded_queue, key=lambda job: job.submit_time))
         
         # Get the submit time of the first job and subtract it from the other jobs
         # We are shifting them to start = 0
-        first_submit_time = self.db.preloaded_queue[0].submit_time
+        self.first_submit_time = self.db.preloaded_queue[0].submit_time
 
         # Preload jobs and calculate their respective half and full node cores
         # usage
         for job in self.db.preloaded_queue:
+            self.setup_job(job)
 
-            # Shift the job by first_submit_time amount
-            job.submit_time -= first_submit_time
-            
-            # Set job id
-            job.job_id = self.cluster.id_counter
-
-            # Setup core resources needed
-            job.full_socket_nodes = ceil(job.num_of_processes / sum(self.cluster.full_socket_allocation))
-            job.half_socket_nodes = ceil(job.num_of_processes / sum(self.cluster.half_socket_allocation))
-
-            # Setup job speedups
-            try:
-                speedups = list(self.db.heatmap[job.job_name].values())
-                speedups = [spd for spd in speedups if spd is not None]
-            except:
-                # Set everything to compact speedup if no list is given
-                speedups = [1]
-            max_speedup = min_speedup = speedups[0]
-            accumulator = length = 0
-            for speedup in speedups:
-                if speedup > max_speedup:
-                    max_speedup = speedup
-                if speedup < min_speedup:
-                    min_speedup = speedup
-
-                accumulator += speedup
-                length += 1
-
-            job.max_speedup = max_speedup
-            job.min_speedup = min_speedup
-            job.avg_speedup = (accumulator / length)
-
-            # Setup job characterization
-            avg = job.avg_speedup
-            std = round(float(np.std(speedups)), 2)
-
-            if avg > 1.02:
-                job.job_character = JobCharacterization.SPREAD
-            elif avg < 0.98:
-                job.job_character = JobCharacterization.COMPACT
+    def setup_job(self, job: Job) -> None:
+        """Setup a job before it is loaded in the preloaded queue
+        """
+
+        # Shift the job by first_submit_time amount
+        job.submit_time -= self.first_submit_time
+        
+        # Set job id
+        job.job_id = self.cluster.id_counter
+
+        # Setup core resources needed
+        job.full_socket_nodes = ceil(job.num_of_processes / sum(self.cluster.full_socket_allocation))
+        job.half_socket_nodes = ceil(job.num_of_processes / sum(self.cluster.half_socket_allocation))
+
+        # Setup job speedups
+        try:
+            speedups = list(self.db.heatmap[job.job_name].values())
+            speedups = [spd for spd in speedups if spd is not None]
+        except:
+            # Set everything to compact speedup if no list is given
+            speedups = [1]
+        max_speedup = min_speedup = speedups[0]
+        accumulator = length = 0
+        for speedup in speedups:
+            if speedup > max_speedup:
+                max_speedup = speedup
+            if speedup < min_speedup:
+                min_speedup = speedup
+
+            accumulator += speedup
+            length += 1
+
+        job.max_speedup = max_speedup
+        job.min_speedup = min_speedup
+        job.avg_speedup = (accumulator / length)
+
+        # Setup job characterization
+        avg = job.avg_speedup
+        std = round(float(np.std(speedups)), 2)
+
+        if avg > 1.02:
+            job.job_character = JobCharacterization.SPREAD
+        elif avg < 0.98:
+            job.job_character = JobCharacterization.COMPACT
+        else:
+            if std > 0.07:
+                job.job_character = JobCharacterization.FRAIL
             else:
-                if std > 0.07:
-                    job.job_character = JobCharacterization.FRAIL
-                else:
-                    job.job_character = JobCharacterization.ROBUST
+                job.job_character = JobCharacterization.ROBUST
 
-            self.cluster.id_counter += 1
+        self.cluster.id_counter += 1
 
-    def load_in_waiting_queue(self) -> None:
+    def stream_preloaded_jobs(self) -> None:
+        """Read jobs from the stream of the database until there is a job in
+        the preloaded queue that has not arrived yet
+        """
 
-        copy = deepcopy_list(self.db.preloaded_queue)
+        if self.db.jobs_stream is None:
+            return
 
-        for job in copy:
-            if job.submit_time <= self.cluster.makespan:
-                # Infinite waiting queue size
-                # if self.cluster.queue_size == -1:
-                #     self.db.preloaded_queue.remove(job)
-                #     self.cluster.waiting_queue.append(job)
+        while len(self.db.preloaded_queue) == 0 or self.db.preloaded_queue[-1].submit_time <= self.cluster.makespan:
 
-                # # Zero size waiting queue
-                # elif self.cluster.queue_size == 0 and\
-                #         len(self.cluster.waiting_queue) == 0 and\
-                #         self.scheduler.find_suitable_nodes(job.num_of_processes, self.cluster.full_socket_allocation) != {}:
-                #             self.db.preloaded_queue.remove(job)
-                #             job.submit_time = self.cluster.makespan
-                #             self.cluster.waiting_queue.append(job)
+            job = next(self.db.jobs_stream, None)
 
-                # # Finite waiting queue size but not 0
-                # elif self.cluster.queue_size > 0 and len(self.cluster.waiting_queue) < self.cluster.queue_size:
-                self.db.preloaded_queue.remove(job)
-                job.submit_time = self.cluster.makespan
-                self.cluster.waiting_queue.append(job)
+            # The stream is exhausted
+            if job is None:
+                break
+
+            self.setup_job(job)
+            self.logger.add_job(job)
+            self.db.preloaded_queue.append(job)
 
-                #else:
-                #    break
+    def load_in_waiting_queue(self) -> None:
+
+        # Read any streamed jobs that arrived
+        self.stream_preloaded_jobs()
+
+        # The preloaded queue is ordered by submit time so the jobs that
+        # arrived are always at its front
+        while len(self.db.preloaded_queue) > 0 and self.db.preloaded_queue[0].submit_time <= self.cluster.makespan:
+            job = self.db.preloaded_queue.popleft()
+            job.submit_time = self.cluster.makespan
+            self.cluster.waiting_queue.append(job)
+            self.arrived_min_procs = min(self.arrived_min_procs, job.num_of_processes)
+            self.cluster.arrivals_version += 1
 
     # Job execution/deploying/cleaning computations
     def calculate_job_rem_time(self, job: Job) -> None:
@@ -154,16 +219,16 @@ class ComputeEngine:
             return
 
         for hostname in job.assigned_hosts:
-            for co_job_signature in list(self.cluster.hosts[hostname].jobs.keys()):
+            for co_job_id in self.cluster.hosts[hostname].jobs:
 
                 # Shouldn't check with ourselves
-                if job.get_signature() == co_job_signature:
+                if job.job_id == co_job_id:
                     continue
 
                 neighbors_exist = True
 
-                co_job_name = co_job_signature.split(":")[-1]
-                speedup = self.db.heatmap[job.job_name][co_job_name]
+                co_job_name = self.cluster.execution_index[co_job_id].job_name
+                speedup = self.db.get_speedup(job.job_name, co_job_name)
                 # If we do not have knowledge of the job's speedup when co-allocated
                 # to the specific co-job then use the average speedup
                 if speedup is None:
@@ -179,34 +244,55 @@ class ComputeEngine:
             # Change only if the worst speedup is different from the current
             # speedup of the job
             if job.sim_speedup != worst_speedup:
-                job.remaining_time *= (job.sim_speedup / worst_speedup)
-                job.sim_speedup = worst_speedup
+                self.update_job_rem_time(job, worst_speedup)
         # If no neighbors exist
         else:
             # If it is spread allocated check to change the rem time
             if spread_allocation:
                 # Change if it had neighbors but now it is executing alone
                 if job.sim_speedup != worst_speedup:
-                    job.remaining_time *= (job.sim_speedup / worst_speedup)
-                    job.sim_speedup = worst_speedup
+                    self.update_job_rem_time(job, worst_speedup)
 
         self.debug_logger.debug(f"Calculated remaining execution time of job {job.get_signature()} with new value {job.remaining_time}")
 
+    def get_job_rem_time(self, job: Job) -> float:
+        """Return the remaining execution time of an executing job at the
+        current simulated time
+        """
+        return self.events.get_finish_time(job) - self.cluster.makespan
+
+    def update_job_rem_time(self, job: Job, speedup: float) -> None:
+        """Rescale the remaining time of an executing job to a new speedup and
+        reschedule its finish event
+        """
+        job.remaining_time = self.get_job_rem_time(job)
+        job.remaining_time *= (job.sim_speedup / speedup)
+        job.sim_speedup = speedup
+        self.events.push(job, self.cluster.makespan + job.remaining_time)
+
+    def mark_host_jobs_dirty(self, hostname: str) -> None:
+        """The neighbors of the jobs executing on a host changed so their
+        remaining time needs to be recalculated
+        """
+        self.dirty_jobs.update(self.cluster.hosts[hostname].jobs.keys())
+
     def deploy_job_to_host(self, hostname: str, job: Job, psets: list[ProcSet]) -> None:
 
 
         # Store hostname in job's registry
         job.assigned_hosts.append(hostname)
 
-        # Add job signature to the host and the processor set it allocates
+        # Add job id to the host and the processor set it allocates
         self.cluster.hosts[hostname].jobs.update({
-            job.get_signature(): psets
+            job.job_id: psets
         })
+        self.cluster.update_host_occupancy(hostname)
 
         # Remove psets from host and decrease the number of idle cores in cluster
-        for i, socket_pset in enumerate(self.cluster.hosts[hostname].sockets):
-            socket_pset -= psets[i]
-            self.cluster.idle_cores -= len(psets[i])
+        self.cluster.allocate_cores(hostname, psets)
+
+        # The job and its new neighbors need to recalculate their remaining time
+        self.mark_host_jobs_dirty(hostname)
 
         # Log the event
         self.logger.log(evts.JobStart, msg=job.get_signature(), job=job, psets=psets, hostname=hostname)
@@ -219,19 +305,27 @@ class ComputeEngine:
         self.debug_logger.debug(f"Job {job.get_signature()} is being deployed")
 
         # Remove job from cluster's waiting queue
-        self.cluster.waiting_queue.remove(job)
+        remove_job(self.cluster.waiting_queue, job)
 
         job.current_state = JobState.EXECUTING
         job.start_time = self.cluster.makespan
 
+        # Index the job so that its neighbors can resolve it by id
+        self.cluster.execution_index[job.job_id] = job
+
         for hostname, psets in suitable_hosts:
             # Deploy job
             self.deploy_job_to_host(hostname, job, psets)
             # Set host state as allocated
-            self.cluster.hosts[hostname].state = Host.ALLOCATED
+            self.cluster.set_host_state(hostname, Host.ALLOCATED)
 
         # Add job to the executing list
         self.cluster.execution_list.append(job)
+        self.cluster.add_running_job(job)
+        self.cluster.deploys_version += 1
+
+        # Schedule the finish event of the job
+        self.events.push(job, self.cluster.makespan + job.remaining_time)
 
         self.debug_logger.debug(f"Job {job.get_signature()} has deployed for execution")
 
@@ -242,6 +336,8 @@ class ComputeEngine:
         # Set the finish time of the job
         job.finish_time = self.cluster.makespan
         job.current_state = JobState.FINISHED
+        self.cluster.finished_jobs_num += 1
+        self.cluster.releases_version += 1
 
         # Clean job and return resources back to host
         for hostname in job.assigned_hosts:
@@ -250,17 +346,23 @@ class ComputeEngine:
 
             # Return the allocated processors of a job to each host 
             # and add the number of returned cores to idle cores of cluster
-            for i, pset in enumerate(self.cluster.hosts[hostname].jobs[job.get_signature()]):
-                self.cluster.hosts[hostname].sockets[i] = self.cluster.hosts[hostname].sockets[i].union(pset)
-                self.cluster.idle_cores += len(pset)
+            self.cluster.release_cores(hostname, self.cluster.hosts[hostname].jobs[job.job_id])
 
-            # Remove job signature from host
-            self.cluster.hosts[hostname].jobs.pop(job.get_signature())
+            # Remove job id from host
+            self.cluster.hosts[hostname].jobs.pop(job.job_id)
+            self.cluster.update_host_occupancy(hostname)
+
+            # The remaining neighbors lost a co-job
+            self.mark_host_jobs_dirty(hostname)
             
             # Change state of host if nothing is executing
             if len(list(self.cluster.hosts[hostname].jobs.keys())) == 0:
-                self.cluster.hosts[hostname].state = Host.IDLE
+                self.cluster.set_host_state(hostname, Host.IDLE)
  
+        # Remove job from the executing jobs indexes
+        self.cluster.remove_running_job(job)
+        self.cluster.execution_index.pop(job.job_id)
+
         # Log the event
         self.logger.log(evts.JobFinish, msg=f"{job.get_signature()}", job=job)
 
@@ -272,31 +374,28 @@ class ComputeEngine:
 
         self.debug_logger.debug("Begin executing the jobs in the execution list")
 
-        #NOTE: consider adding multithreading to
-        # 1) Job calculation for remaining time (reminder: the number of resources 
-        # also constrain the number of executing jobs, so it might not provide much)
-        # 2) Finding the minimum remaining execution time
-        # 3) Finding the minimum showup time in the preloaded queue (this is a more preferrable action
-        # at least in the beginning of a simulation)
+        #NOTE: consider adding multithreading to the job calculation for
+        # remaining time (reminder: the number of resources also constrain the
+        # number of executing jobs, so it might not provide much)
 
-        # Recalculate the remaining time of jobs
+        # Recalculate the remaining time of the jobs whose neighbors changed
+        for job_id in self.dirty_jobs:
+            job = self.cluster.execution_index.get(job_id)
+            if job is not None:
+                self.calculate_job_rem_time(job)
+        self.dirty_jobs = set()
 
-        # Find the minimum remaining execution time of the jobs currently executing
-        min_rem_time = inf
-        for job in self.cluster.execution_list:
-            self.calculate_job_rem_time(job)
-            if job.remaining_time < min_rem_time:
-                min_rem_time = job.remaining_time
+        # The earliest time an executing job will finish
+        next_time = self.events.peek_time()
 
-        # Find the minimum remaining time for a job to show up in the waiting
-        # queue of the cluster
-        for job in self.db.preloaded_queue:
-            showup_time = job.submit_time - self.cluster.makespan
-            if showup_time > 0 and showup_time < min_rem_time:
-                min_rem_time = showup_time
-            else:
-                # They are already sorted by increasing arrival time
-                break
+        # The earliest time a job will show up in the waiting queue of the
+        # cluster; the preloaded jobs are sorted by increasing arrival time
+        if len(self.db.preloaded_queue) > 0:
+            showup_time = self.db.preloaded_queue[0].submit_time
+            if showup_time > self.cluster.makespan and showup_time < next_time:
+                next_time = showup_time
+
+        min_rem_time = next_time - self.cluster.makespan
         
         if min_rem_time <= 0:
             self.debug_logger.error(f"The minimum next simulation step time is {min_rem_time} <=0")
@@ -305,7 +404,7 @@ class ComputeEngine:
         # Guard the execution
         assert min_rem_time > 0
 
-        if min_rem_time == inf and (self.cluster.waiting_queue != [] or self.db.preloaded_queue != []):
+        if min_rem_time == inf and (self.cluster.waiting_queue != [] or len(self.db.preloaded_queue) > 0):
             print()
             print(self.cluster.get_idle_cores())
             print("PREL", self.db.preloaded_queue)
@@ -316,12 +415,21 @@ class ComputeEngine:
             raise RuntimeError
 
         # Forward the time of the execution
-        self.cluster.makespan += min_rem_time
+        self.cluster.makespan = next_time
         self.debug_logger.debug(f"The new makespan is {self.cluster.makespan}")
 
         # Log the event
         self.logger.log(evts.CompEngineNextTimeStep, msg=f"{min_rem_time}")
 
+        # Get the jobs that finished execution
+        finished_jobs = self.events.pop_until(self.cluster.makespan)
+
+        if finished_jobs == []:
+            self.debug_logger.debug("Finished executing the jobs in the execution list")
+            return
+
+        finished_ids = {job.job_id for job in finished_jobs}
+
         # "Execute" the jobs
         execution_list: list[Job] = list()
 
@@ -332,10 +440,8 @@ class ComputeEngine:
         # Remove/clean any jobs that finished execution
         for job in self.cluster.execution_list:
 
-            # "Execute" job
-            job.remaining_time -= min_rem_time
-
-            if job.remaining_time == 0:
+            if job.job_id in finished_ids:
+                job.remaining_time = 0
                 self.clean_job_from_hosts(job)
             else:
                 execution_list.append(job)
@@ -345,6 +451,35 @@ class ComputeEngine:
 
         self.debug_logger.debug("Finished executing the jobs in the execution list")
 
+    def scheduling_needed(self) -> bool:
+        """Return False if no change of the cluster since the last scheduling
+        pass can let the scheduler deploy a job
+        """
+
+        # The scheduler has not run yet
+        if self.last_pass_version is None:
+            return True
+
+        # The bookings of the scheduler changed with time
+        if self.cluster.makespan >= self.scheduler.next_pass_time:
+            return True
+
+        version = self.cluster.get_state_version()
+        changed = {change for change in version if version[change] != self.last_pass_version[change]}
+
+        # The waiting jobs could not be deployed in the last pass and only the
+        # changes declared by the scheduler can let them deploy now
+        if (changed - {"arrivals"}) & self.scheduler.triggers:
+            return True
+
+        # New jobs matter if the scheduler looks past the head of the waiting
+        # queue or if they are the new head; still a job can not start if
+        # there are not enough idle cores for it
+        if "arrivals" in changed and ("arrivals" in self.scheduler.triggers or self.last_pass_queue_empty):
+            return self.arrived_min_procs <= self.cluster.get_idle_cores()
+
+        return False
+
     def sim_step(self) -> None:
 
         self.debug_logger.debug("Begin of a simulation step")
@@ -355,8 +490,12 @@ class ComputeEngine:
         self.debug_logger.debug("Loading any job(s) that arrived in the waiting queue")
         self.load_in_waiting_queue()
         
-        # Check if there are any jobs left waiting
-        if self.cluster.waiting_queue != []:
+        # Check if there are any jobs left waiting and if anything changed
+        # that may let them deploy
+        if self.cluster.waiting_queue != [] and self.scheduling_needed():
+
+            # The deployments of this pass are changes for the next one
+            self.last_pass_version = self.cluster.get_state_version()
 
             # Deploy/Submit jobs to the execution list
             deployed = self.scheduler.deploy()
@@ -367,6 +506,9 @@ class ComputeEngine:
                 # Execute the backfilling algorithm
                 deployed |= self.scheduler.backfill()
 
+            self.last_pass_queue_empty = self.cluster.waiting_queue == []
+            self.arrived_min_procs = inf
+
         # If deployed restart scheduling procedure
         # if deployed:
         #     self.debug_logger.debug("End of a simulation step")
@@ -377,5 +519,9 @@ class ComputeEngine:
         # 2. There are no jobs in the waiting queue but there are in the 
         #    queue preloaded
         self.goto_next_sim_state()
+
+        if self.cluster.makespan >= self.next_checkpoint:
+            self.debug_logger.debug(f"Storing a snapshot of the simulation to {self.checkpoint_path}")
+            self.checkpoint()
         
         self.debug_logger.debug("End of a simulation step")
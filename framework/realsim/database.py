@@ -11,9 +11,12 @@ execution list will be a list of floating number and not a list of lists. Also
 the jobs will be addressed by their ids.
 """
 
+import numpy as np
 import os
 import sys
-from typing import Optional, Protocol
+from collections import deque
+from math import isnan
+from typing import Optional, Protocol, Union
 
 # Set the root directory of the api library
 sys.path.append(os.path.abspath(os.path.join(
@@ -38,17 +41,47 @@ class InferenceEngine(Protocol):
     def predict(self, X):
         pass
 
+# Define a stream of jobs that are read lazily from a workload source
+class JobsStream(Protocol):
+    def __next__(self) -> Job:
+        pass
+
+    def deepcopy(self) -> "JobsStream":
+        pass
+
+    def count_jobs(self) -> int:
+        pass
+
 
 class Database:
 
     def __init__(self, 
-                 jobs_set: list[Job], 
+                 jobs_set: Union[list[Job], JobsStream], 
                  heatmap: Heatmap = dict(),
                  engine: Optional[InferenceEngine] = None):
-        self.preloaded_queue = deepcopy_list(jobs_set)
+        if isinstance(jobs_set, list):
+            self.preloaded_queue: deque[Job] = deque(deepcopy_list(jobs_set))
+            self.jobs_stream: Optional[JobsStream] = None
+        else:
+            # The jobs are admitted lazily by the compute engine while the
+            # simulation clock advances
+            self.preloaded_queue = deque()
+            self.jobs_stream = jobs_set.deepcopy()
         self.heatmap = heatmap
         self.engine = engine
 
+        # Interned job names and the heatmap as a dense matrix of speedups
+        # where NaN marks an unknown speedup; both are built at setup
+        self.name_ids: dict[str, int] = dict()
+        self.speedups = np.full((1, 1), np.nan)
+
+    def get_jobs_num(self) -> int:
+        """Return the number of jobs that will be simulated
+        """
+        if self.jobs_stream is not None:
+            return self.jobs_stream.count_jobs()
+        return len(self.preloaded_queue)
+
     def pop(self, queue: list[Job]) -> Job:
         job: Job = queue[0]
         queue.remove(job)
@@ -92,5 +125,50 @@ class Database:
                             job.job_name: self.engine.predict(co_tag)
                     })
 
+    def init_speedups(self):
+        """Intern the job names of the heatmap to integer ids and store the
+        speedups in a dense matrix indexed by them. The last row and column
+        are reserved for names that do not exist in the heatmap.
+        """
+
+        self.name_ids = dict()
+        for name, co_speedups in self.heatmap.items():
+            self.name_ids.setdefault(name, len(self.name_ids))
+            for co_name in co_speedups:
+                self.name_ids.setdefault(co_name, len(self.name_ids))
+
+        self.speedups = np.full((len(self.name_ids) + 1, len(self.name_ids) + 1), np.nan)
+        for name, co_speedups in self.heatmap.items():
+            for co_name, speedup in co_speedups.items():
+                if speedup is not None:
+                    self.speedups[self.name_ids[name], self.name_ids[co_name]] = speedup
+
+    def get_name_id(self, name: str) -> int:
+        return self.name_ids.get(name, len(self.name_ids))
+
+    def get_name_ids(self, names: Union[str, list[str]]):
+        """Return the id of a name or an array with the ids of a list of names
+        """
+        if isinstance(names, str):
+            return self.get_name_id(names)
+        return np.array([self.get_name_id(name) for name in names], dtype=np.intp)
+
+    def get_speedup(self, name: str, co_name: str) -> Optional[float]:
+        """Return the speedup of a job when co-scheduled with a co-job or None
+        if it is unknown
+        """
+        speedup = self.speedups.item(self.get_name_id(name), self.get_name_id(co_name))
+        return None if isnan(speedup) else speedup
+
+    def get_speedups(self, 
+                     names: Union[str, list[str]], 
+                     co_names: Union[str, list[str]]) -> np.ndarray:
+        """Return the speedups of the jobs when co-scheduled with the co-jobs
+        pairwise; a single name is broadcast against a list. Unknown speedups
+        are NaN.
+        """
+        return self.speedups[self.get_name_ids(names), self.get_name_ids(co_names)]
+
     def setup(self):
         self.init_heatmap()
+        self.init_speedups()
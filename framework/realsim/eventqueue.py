@@ -0,0 +1,79 @@
+"""
+The event queue stores the future finish events of the executing jobs ordered
+by the simulated time they will happen. The compute engine uses it to find the
+next simulation step without scanning the whole execution list.
+
+Whenever the speedup of an executing job changes a new event is pushed for the
+job and the old one becomes stale. Stale events are not removed from the heap
+right away; they are discarded lazily when they reach the top of it.
+"""
+
+import heapq
+import os
+import sys
+from math import inf
+
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "../"
+)))
+
+from realsim.jobs.jobs import Job
+
+
+class EventQueue:
+
+    def __init__(self):
+
+        # Heap of (finish time, sequence number, job) entries
+        self.heap: list[tuple[float, int, Job]] = list()
+
+        # The valid finish time of each executing job by job id
+        self.finish_times: dict[int, float] = dict()
+
+        # Sequence number to keep the order of events with the same time
+        self.counter: int = 0
+
+    def __len__(self) -> int:
+        return len(self.finish_times)
+
+    def __is_stale(self, entry: tuple[float, int, Job]) -> bool:
+        finish_time, _, job = entry
+        return self.finish_times.get(job.job_id) != finish_time
+
+    def push(self, job: Job, finish_time: float) -> None:
+        """Set (or reset) the time that an executing job will finish
+        """
+        self.finish_times[job.job_id] = finish_time
+        heapq.heappush(self.heap, (finish_time, self.counter, job))
+        self.counter += 1
+
+    def remove(self, job: Job) -> None:
+        """Invalidate any finish event of a job
+        """
+        self.finish_times.pop(job.job_id, None)
+
+    def get_finish_time(self, job: Job) -> float:
+        return self.finish_times.get(job.job_id, inf)
+
+    def peek_time(self) -> float:
+        """Return the time of the earliest valid event or inf if there is none
+        """
+        while self.heap != [] and self.__is_stale(self.heap[0]):
+            heapq.heappop(self.heap)
+
+        if self.heap == []:
+            return inf
+
+        return self.heap[0][0]
+
+    def pop_until(self, time: float) -> list[Job]:
+        """Pop and return the jobs that finish up to and including time
+        """
+        jobs: list[Job] = list()
+
+        while self.peek_time() <= time:
+            _, _, job = heapq.heappop(self.heap)
+            self.finish_times.pop(job.job_id)
+            jobs.append(job)
+
+        return jobs
@@ -6,6 +6,75 @@ sys.path.append(os.path.abspath(
 
 from realsim.generators import *
 from realsim.generators.AGenerator import  AbstractGenerator
+from typing import Optional
+
+
+class SWFJobsStream:
+    """Lazily read the jobs of a SWF file one record at a time. The records
+    are expected to be ordered by their submit time, as SWF files are.
+
+    Only the path and the byte offset of the next record are kept when the
+    stream is copied or pickled, so the file is reopened on the next read.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset: int = 0
+        self.exhausted: bool = False
+        self.__fd = None
+        self.__generator: Optional["SWFGenerator"] = None
+
+    def __getstate__(self):
+        return {"path": self.path, "offset": self.offset, "exhausted": self.exhausted}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+        self.offset = state["offset"]
+        self.exhausted = state["exhausted"]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Job:
+        if self.exhausted:
+            raise StopIteration
+
+        if self.__fd is None:
+            self.__fd = open(self.path, "rb")
+            self.__fd.seek(self.offset)
+            self.__generator = SWFGenerator()
+
+        while True:
+            line = self.__fd.readline()
+            self.offset = self.__fd.tell()
+
+            if not line:
+                self.exhausted = True
+                self.__fd.close()
+                self.__fd = None
+                raise StopIteration
+
+            line = line.decode()
+            if line.startswith(";") or line.strip() == "":
+                continue
+
+            return self.__generator.generate_job(line)
+
+    def deepcopy(self) -> "SWFJobsStream":
+        stream = SWFJobsStream(self.path)
+        stream.offset = self.offset
+        stream.exhausted = self.exhausted
+        return stream
+
+    def count_jobs(self) -> int:
+        """Count the job records of the whole file without parsing them
+        """
+        jobs_num = 0
+        with open(self.path, "rb") as fd:
+            for line in fd:
+                if not line.startswith(b";") and line.strip() != b"":
+                    jobs_num += 1
+        return jobs_num
 
 
 class SWFGenerator(AbstractGenerator[str]):
@@ -54,3 +123,10 @@ class SWFGenerator(AbstractGenerator[str]):
             raise Exception("The swf file passed was empty.")
         
         return jobs_set
+
+    def generate_jobs_stream(self, arg: str) -> SWFJobsStream:
+        """Return a stream that reads the jobs of the swf file lazily
+        """
+        if not os.path.exists(arg):
+            raise Exception("The swf file passed doesn't exist.")
+        return SWFJobsStream(arg)
@@ -29,6 +29,19 @@ class Job:
     """Class that simulates an HPC job
     """
 
+    # The attributes are stored in slots instead of a per instance dictionary
+    # to keep the memory footprint and the attribute access time low for long
+    # workloads
+    __slots__ = (
+        "job_id", "job_name", "_signature", "_signature_id", "_signature_name",
+        "num_of_processes", "full_socket_nodes", "half_socket_nodes",
+        "assigned_hosts", "socket_conf",
+        "remaining_time", "submit_time", "waiting_time", "wall_time",
+        "start_time", "finish_time",
+        "sim_speedup", "avg_speedup", "max_speedup", "min_speedup",
+        "job_tag", "job_character", "current_state", "age"
+    )
+
     def __init__(self, 
                  job_id: int, 
                  job_name: str, 
@@ -42,6 +55,9 @@ class Job:
         # Important identifiers of the job
         self.job_id = job_id
         self.job_name = job_name
+        self._signature = f"{job_id}:{job_name}"
+        self._signature_id = job_id
+        self._signature_name = job_name
 
         # Cores/Nodes resources
         self.num_of_processes = num_of_processes if num_of_processes > 0 else 1
@@ -98,7 +114,7 @@ class Job:
 
     def __repr__(self) -> str:
         #return f"[{self.job_id}:{self.job_name}],(T:{self.remaining_time}),(C:{len(self.assigned_cores)}),(S:{self.sim_speedup})"
-        return str(self.__dict__)
+        return str({attr: getattr(self, attr) for attr in Job.__slots__ if not attr.startswith("_")})
         return f"[{self.job_id}:{self.job_name},T:{self.remaining_time},S:{self.sim_speedup}]"
 
     def get_avg_speedup(self) -> float:
@@ -143,4 +159,10 @@ class Job:
         return copy
 
     def get_signature(self) -> str:
-        return f"{self.job_id}:{self.job_name}"
+        # The signature is cached and only rebuilt if the id or the name of
+        # the job have been reassigned since
+        if self._signature_id != self.job_id or self._signature_name != self.job_name:
+            self._signature = f"{self.job_id}:{self.job_name}"
+            self._signature_id = self.job_id
+            self._signature_name = self.job_name
+        return self._signature
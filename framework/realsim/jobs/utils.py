@@ -28,3 +28,19 @@ def deepcopy_list(jobs_list: list[Job]):
     # If everything turns out okay then return the new list
     return new_list
 
+
+def remove_job(jobs_list: list[Job], job: Job) -> None:
+    """
+    Remove a job from a list of jobs by its identity.
+    ---
+    The schedulers hand the same Job instances that live in the waiting queue
+    to the compute engine, so there is no need to compare them field by field
+    with Job.__eq__.
+    """
+
+    for idx, other in enumerate(jobs_list):
+        if other is job:
+            del jobs_list[idx]
+            return
+
+    raise ValueError(f"Job {job.get_signature()} is not in the list")
@@ -0,0 +1,217 @@
+"""
+The history of the cluster is animated as a heatmap of the cores of each host
+with one frame per point in time. A frame is a flat array with the id of the
+job that occupies each core of the cluster or FREE_CORE.
+
+Frames can also be stored as delta frames: each one only keeps the cores that
+changed since the previous frame. The delta frames are replayed back into the
+full animation when they are displayed.
+"""
+
+import json
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.express.colors as colors
+
+# Value of the cores that no job occupies
+FREE_CORE = -100
+
+
+def select_frame_times(checkpoints: list, max_frames: Optional[int] = None) -> list:
+    """Pick up to max_frames of the sorted checkpoints spread evenly over the
+    simulation; the first and the last checkpoint are always kept
+    """
+    if max_frames is None or len(checkpoints) <= max_frames:
+        return checkpoints
+
+    if max_frames < 2:
+        return checkpoints[-1:]
+
+    positions = np.unique(np.linspace(0, len(checkpoints) - 1, max_frames).round().astype(np.intp))
+    return [checkpoints[position] for position in positions.tolist()]
+
+
+def encode_delta_frames(frames: Iterable[np.ndarray]) -> list[dict]:
+    """Keep only the cores that changed from the previous frame; the first
+    frame is compared against an empty cluster
+    """
+    deltas = list()
+    previous = None
+
+    for frame in frames:
+        if previous is None:
+            previous = np.full(len(frame), FREE_CORE, dtype=frame.dtype)
+
+        cells = np.flatnonzero(frame != previous)
+        deltas.append({
+            "cells": cells.tolist(),
+            "jobs": frame[cells].tolist()
+        })
+        previous = frame
+
+    return deltas
+
+
+def decode_delta_frames(deltas: list[dict], cells_num: int) -> Iterator[np.ndarray]:
+    """Rebuild the full frames from delta frames
+    """
+    frame = np.full(cells_num, FREE_CORE, dtype=np.int64)
+
+    for delta in deltas:
+        frame[np.array(delta["cells"], dtype=np.intp)] = delta["jobs"]
+        yield frame.copy()
+
+
+def animated_cluster_figure(title: str,
+                            hosts: list[str],
+                            ppn: int,
+                            times: list,
+                            frames: Iterable[np.ndarray],
+                            labels: dict[int, str],
+                            num_of_jobs: int) -> go.Figure:
+    """Build the animated heatmap of the cluster from full frames
+    """
+
+    num_of_hosts = len(hosts)
+    cores = list(range(1, ppn+1))
+    core_ticks = [x for x in cores]
+    core_ticknames = [f"Core {x}" for x in cores]
+
+    jcolors = colors.sample_colorscale(colors.sequential.Turbo, [n/(num_of_jobs - 1) for n in range(num_of_jobs)]) \
+            if num_of_jobs > 1 else [colors.sequential.Turbo[0]] * 2
+
+    # Text of each occupied core; FREE_CORE maps to the empty text at the end
+    job_ids = sorted(labels)
+    label_ids = np.full(max(job_ids, default=-1) + 1, len(job_ids), dtype=np.intp)
+    label_ids[job_ids] = np.arange(len(job_ids))
+    texts = np.array([labels[job_id] for job_id in job_ids] + [""], dtype=object)
+
+    animation_frames = list()
+    for check, frame in zip(times, frames):
+        occupied = frame >= 0
+        text = np.full(len(frame), "", dtype=object)
+        text[occupied] = texts[label_ids[frame[occupied]]]
+
+        # The rest of the attributes of the heatmap stay as in the figure
+        animation_frames.append(
+                go.Frame(data=[
+                    go.Heatmap(
+                        z=frame.reshape(num_of_hosts, ppn).tolist(),
+                        text=text.reshape(num_of_hosts, ppn).tolist()
+                    )
+                ], name=str(check))
+        )
+
+    fig = go.Figure(
+            data=[
+                go.Heatmap(
+                    z=[[FREE_CORE] * ppn] * num_of_hosts,
+                    x=cores,
+                    y=hosts,
+                    xgap=3,
+                    ygap=3,
+                    colorscale=jcolors,
+                    zmin=0,
+                    zmax=num_of_jobs-1,
+                    text=[[""] * ppn] * num_of_hosts,
+                    hovertemplate="Job: %{text}<br>%{x}<br>%{y}<extra></extra>"
+                )
+            ],
+            layout=go.Layout(
+                title=title,
+                title_x=0.5,
+                xaxis=dict(
+                    tickmode="array",
+                    tickvals=core_ticks,
+                    ticktext=core_ticknames
+                ),
+                updatemenus=[{
+                    "buttons": [
+                        {
+                            "args": [
+                                None,
+                                {
+                                    "frame": {"duration": 500, "redraw": True},
+                                    "fromcurrent": True,
+                                    "transition": {"duration": 300}
+                                }
+                            ],
+                            "label": "Play",
+                            "method": "animate"
+                        },
+                        {
+                            "args": [
+                                [None],
+                                {
+                                    "frame": {"duration": 0, "redraw": True},
+                                    "mode": "immediate",
+                                    "transition": {"duration": 0}
+                                }
+                            ],
+                            "label": "Pause",
+                            "method": "animate"
+                        }
+                    ],
+                    "direction": "left",
+                    'pad': {'r': 10, 't': 87},
+                    "showactive": False,
+                    "type": "buttons",
+                    "x": 0.04,
+                    "xanchor": "center",
+                    "y": 0.029,
+                    "yanchor": "top"
+                }],
+                sliders=[{
+                    'active': 0,
+                    'yanchor': 'top',
+                    'xanchor': 'left',
+                    'currentvalue': {
+                        'prefix': 'Time:',
+                        'visible': True,
+                        'xanchor': 'right'
+                    },
+                    'transition': {'duration': 300, 'easing': 'cubic-in-out'},
+                    'pad': {'b': 10},
+                    'len': 0.9,
+                    'x': 0.1,
+                    'y': -0.01,
+                    'steps': [{
+                        'args': [
+                            [str(t)],
+                            {'frame': {'duration': 0, 'redraw': True}, 'mode': 'immediate', 'transition': {'duration': 0}}
+                        ],
+                        'label': str(t),
+                        'method': 'animate'
+                    } for t in times]
+                }]
+            ),
+            frames=animation_frames
+    )
+
+    return fig
+
+
+def is_delta_animation(data: str) -> bool:
+    return data.lstrip().startswith('{"encoding": "delta"')
+
+
+def replay_animated_cluster(data: str) -> str:
+    """Turn an animation stored as delta frames into the JSON of the full
+    figure; any other figure is returned as it is
+    """
+    if not is_delta_animation(data):
+        return data
+
+    animation = json.loads(data)
+    labels = {int(job_id): label for job_id, label in animation["labels"].items()}
+    frames = decode_delta_frames(animation["deltas"], len(animation["hosts"]) * animation["ppn"])
+
+    return animated_cluster_figure(animation["title"],
+                                   animation["hosts"],
+                                   animation["ppn"],
+                                   animation["times"],
+                                   frames,
+                                   labels,
+                                   animation["num of jobs"]).to_json()
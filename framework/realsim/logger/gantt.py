@@ -0,0 +1,161 @@
+"""
+Scalable renderings of the Gantt plot of a simulation. A Gantt plot is given
+as rectangles, one for each contiguous interval of cores that a job occupied
+for its execution, with the job's index to pick its color.
+
+The interactive plot draws all the rectangles with a few WebGL traces, one for
+each color, whose polygons are separated by gaps. A single trace is not
+possible: the fill color of a trace is a single color, while marker colors
+only apply to the vertices and not to the filled polygons. The number of
+traces is bounded by the number of colors instead. WebGL scatter traces close
+a polygon at every gap when they fill toself, so each rectangle is filled on
+its own. The batch mode rasterizes the rectangles straight into an image with
+NumPy and stores it as a PNG.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+import plotly.express.colors as colors
+import plotly.graph_objects as go
+
+
+def sample_colors(scale: list[str], points: np.ndarray) -> np.ndarray:
+    """Interpolate a colorscale of hex colors at points in [0, 1] and return
+    the RGB values as a (points, 3) array
+    """
+    stops = np.array([colors.hex_to_rgb(color) for color in scale], dtype=float)
+    positions = np.linspace(0, 1, len(stops))
+    return np.column_stack([np.interp(points, positions, stops[:, channel])
+                            for channel in range(3)])
+
+
+def color_points(num_of_jobs: int) -> np.ndarray:
+    """The point of each job's color on the colorscale
+    """
+    if num_of_jobs < 2:
+        return np.zeros(num_of_jobs)
+    return np.arange(num_of_jobs) / (num_of_jobs - 1)
+
+
+def gantt_traces(rects: np.ndarray,
+                 labels: list[str],
+                 hover: np.ndarray,
+                 num_of_jobs: int,
+                 scale: list[str],
+                 max_colors: int = 32) -> list[go.Scattergl]:
+    """Build the WebGL traces of the Gantt plot
+    + rects  : (rectangles, 5) array of job index, start time, finish time,
+               first core and last core
+    + labels : the signature of each rectangle's job
+    + hover  : (rectangles, 5) array of submit time, start time, finish time,
+               waiting time and hosts of each rectangle's job
+    + num_of_jobs : number of jobs that the colors are spread over
+    + max_colors  : the number of colors and so the most traces drawn
+    """
+
+    # Jobs are binned to a bounded number of colors along the colorscale
+    num_of_colors = max(min(max_colors, num_of_jobs), 1)
+    bins = np.rint(color_points(num_of_jobs)[rects[:, 0].astype(np.intp)] * (num_of_colors - 1)).astype(np.intp) \
+            if num_of_colors > 1 else np.zeros(len(rects), dtype=np.intp)
+    rgbs = sample_colors(scale, color_points(num_of_colors)).round().astype(int)
+
+    # The vertices of each rectangle and the gap that separates it from the
+    # next one
+    corners_x = np.array([1, 2, 2, 1, 1])
+    corners_y = np.array([3, 3, 4, 4, 3])
+
+    procs = rects[:, 4] - rects[:, 3] + 1
+    labels = np.array(labels, dtype=object)
+
+    traces = list()
+    for color in np.unique(bins).tolist():
+        selected = np.flatnonzero(bins == color)
+        vertices = len(corners_x) + 1
+
+        # The gaps are NaN vertices which end the polygons
+        xs = np.full((len(selected), vertices), np.nan)
+        ys = np.full((len(selected), vertices), np.nan)
+        xs[:, :-1] = rects[selected][:, corners_x]
+        ys[:, :-1] = rects[selected][:, corners_y]
+
+        # Every vertex carries the data of its job for the hover text
+        customdata = np.column_stack((hover[selected], procs[selected]))
+        customdata = np.repeat(customdata, vertices, axis=0)[:-1]
+        text = np.repeat(labels[selected], vertices)[:-1]
+
+        r, g, b = rgbs[color]
+
+        # A gap after the last polygon would leave a dangling vertex
+        traces.append(go.Scattergl(
+            x=xs.ravel()[:-1],
+            y=ys.ravel()[:-1],
+            mode="lines",
+            line=dict(width=0.1, color="black"),
+            fill="toself",
+            fillcolor=f"rgb({r}, {g}, {b})",
+            showlegend=False,
+            text=text,
+            customdata=customdata,
+            hovertemplate="<b>%{text}</b><br>"+
+            "submit time = %{customdata[0]:.2f} s<br>"+
+            "start time = %{customdata[1]:.2f} s<br>"+
+            "finish time = %{customdata[2]:.2f} s<br>"+
+            "waiting time = %{customdata[3]:.2f} s<br>"+
+            "hosts = %{customdata[4]}<br>"+
+            "processors = %{customdata[5]}<extra></extra>"
+        ))
+
+    return traces
+
+
+def rasterize_gantt(rects: np.ndarray,
+                    num_of_jobs: int,
+                    scale: list[str],
+                    makespan: float,
+                    total_cores: int,
+                    width: int = 2048,
+                    height: int = 1024) -> np.ndarray:
+    """Paint the rectangles of the Gantt plot into a (height, width, 3) RGB
+    image; time grows to the right and cores grow upwards
+    """
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+
+    if len(rects) == 0 or not makespan > 0:
+        return image
+
+    rgbs = sample_colors(scale, color_points(num_of_jobs)).round().astype(np.uint8)
+
+    # Pixel bounds of the rectangles; every rectangle covers at least a pixel
+    x0 = np.clip(np.floor(rects[:, 1] / makespan * width), 0, width - 1).astype(np.intp)
+    x1 = np.clip(np.ceil(rects[:, 2] / makespan * width), 0, width).astype(np.intp)
+    y0 = np.clip(np.floor((rects[:, 3] - 1) / total_cores * height), 0, height - 1).astype(np.intp)
+    y1 = np.clip(np.ceil(rects[:, 4] / total_cores * height), 0, height).astype(np.intp)
+    x1 = np.maximum(x1, x0 + 1)
+    y1 = np.maximum(y1, y0 + 1)
+
+    job_colors = rgbs[rects[:, 0].astype(np.intp)]
+    for left, right, bottom, top, color in zip(x0.tolist(), x1.tolist(), y0.tolist(), y1.tolist(), job_colors):
+        image[height - top:height - bottom, left:right] = color
+
+    return image
+
+
+def write_png(path: str, image: np.ndarray) -> None:
+    """Store a (height, width, 3) uint8 RGB image as a PNG file
+    """
+    height, width, _ = image.shape
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xffffffff)
+
+    # Each scanline starts with the filter type (0 for none)
+    scanlines = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    scanlines[:, 1:] = image.reshape(height, width * 3)
+
+    with open(path, "wb") as fd:
+        fd.write(b"\x89PNG\r\n\x1a\n")
+        fd.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        fd.write(chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6)))
+        fd.write(chunk(b"IEND", b""))
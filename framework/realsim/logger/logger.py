@@ -1,7 +1,9 @@
 import os
 import sys
 from functools import reduce
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Iterator, Optional, TextIO
+import io
+import json
 from datetime import timedelta
 
 sys.path.append(os.path.abspath(
@@ -17,9 +19,13 @@ from realsim.jobs.jobs import Job
 from realsim.database import Database
 from realsim.cluster.cluster import Cluster
 import realsim.logger.logevts as evts
+from realsim.logger.animation import (FREE_CORE, animated_cluster_figure,
+                                      encode_delta_frames, select_frame_times)
+from realsim.logger.gantt import gantt_traces, rasterize_gantt
 import plotly.graph_objects as go
 import plotly.express.colors as colors
 from procset import ProcSet
+import numpy as np
 
 if TYPE_CHECKING:
     from realsim.scheduler.scheduler import Scheduler
@@ -47,6 +53,16 @@ class Logger(object):
         self.cluster_logs: list[str] = list()
         self.scheduler_logs: list[str] = list()
 
+        # Options of the cluster history animation: the maximum number of
+        # frames (None for a frame per checkpoint) and whether to store only
+        # the cores that change between frames
+        self.animation_frames: Optional[int] = None
+        self.animation_delta: bool = False
+
+        # The format of the exported workloads: csv or npy (a structured
+        # array that can be memory-mapped)
+        self.workload_format: str = "csv"
+
     def log(self, evt: type[evts.LogEvent], **kwargs) -> None:
 
         if self.debug:
@@ -58,17 +74,18 @@ class Logger(object):
         if evt == evts.JobStart:
             job: Job = kwargs["job"]
             psets: list[ProcSet] = kwargs["psets"]
-            pset = reduce(lambda pA, pB: pA.union(pB), psets)
             hostname: str = kwargs["hostname"]
-            self.job_events[job.get_signature()]["submit time"] = job.submit_time
-            self.job_events[job.get_signature()]["start time"] = job.start_time
-            self.job_events[job.get_signature()]["waiting time"] = job.start_time - job.submit_time
-            self.job_events[job.get_signature()]["assigned procs"] = self.job_events[job.get_signature()]["assigned procs"].union(pset)
-            self.job_events[job.get_signature()]["hosts"].add(hostname)
+            job_id = job.job_id
+            self.submit_times[job_id] = job.submit_time
+            self.start_times[job_id] = job.start_time
+            self.assigned_cores[job_id] += sum([len(pset) for pset in psets])
+            self.allocations.setdefault(job_id, list()).append((hostname, psets))
+            self.__job_events = None
 
         if evt == evts.JobFinish:
             job: Job = kwargs["job"]
-            self.job_events[job.get_signature()]["finish time"] = job.finish_time
+            self.finish_times[job.job_id] = job.finish_time
+            self.__job_events = None
 
         # When a log is submitted update also the values
         if evt == evts.JobStart or evt == evts.JobFinish:
@@ -100,65 +117,134 @@ class Logger(object):
         self.cluster_events["finished jobs"] = [0]
 
         # Events #
-        # Job events
-        self.job_events: dict[str, dict] = dict()
+        # Job events are recorded in columns indexed by job id
+        self.jobs_num = 0
+        self.job_names: list[str] = list()
+        self.submit_times = np.zeros(0)
+        self.start_times = np.zeros(0)
+        self.finish_times = np.zeros(0)
+        self.wall_times = np.zeros(0)
+        self.num_of_processes = np.zeros(0, dtype=np.int64)
+        self.assigned_cores = np.zeros(0, dtype=np.int64)
+
+        # The hosts and processor sets that each started job allocated
+        self.allocations: dict[int, list[tuple[str, list[ProcSet]]]] = dict()
+
+        # Materialized view of the columns (see job_events)
+        self.__job_events = None
 
         # Init job events
+        self.reserve_jobs(len(self.database.preloaded_queue))
         for job in self.database.preloaded_queue:
-            # Job events
-            jevts = {
-                    "trace": [], # [co-job, start time, end time]
-                    "speedups": [], # [sp1, sp2, ..]
-                    "cores": dict(), # {cojob1: cores1, cojob2: cores2, ..}
-                    "assigned procs": ProcSet(),
-                    "hosts": set(),
-                    "remaining time": [],
-                    "start time": 0,
-                    "finish time": 0,
-                    "submit time": 0,
-                    "waiting time": 0,
-                    "wall time": job.wall_time,
-                    "num of processes": job.num_of_processes
-            }
-            self.job_events[job.get_signature()] = jevts
+            self.add_job(job)
+
+    def reserve_jobs(self, capacity: int) -> None:
+        """Grow the columns of the job events to hold at least capacity jobs
+        """
+        size = len(self.submit_times)
+        if capacity <= size:
+            return
+
+        # Grow geometrically so that streamed jobs are added in amortized
+        # constant time
+        capacity = max(capacity, 2 * size)
+        for column in ["submit_times", "start_times", "finish_times", "wall_times",
+                       "num_of_processes", "assigned_cores"]:
+            values = getattr(self, column)
+            grown = np.zeros(capacity, dtype=values.dtype)
+            grown[:size] = values
+            setattr(self, column, grown)
+
+        self.job_names.extend([""] * (capacity - len(self.job_names)))
+
+    def add_job(self, job: Job):
+        """Initialize the events of a job that will be simulated
+        """
+        job_id = job.job_id
+        self.reserve_jobs(job_id + 1)
+        self.jobs_num = max(self.jobs_num, job_id + 1)
+
+        self.job_names[job_id] = job.job_name
+        self.wall_times[job_id] = job.wall_time
+        self.num_of_processes[job_id] = job.num_of_processes
+        self.__job_events = None
+
+    def get_job_events(self, job_id: int) -> dict:
+        """Build the events of a job as a dictionary
+        """
+        allocations = self.allocations.get(job_id, [])
+        psets = [pset for _, host_psets in allocations for pset in host_psets]
+        submit_time = float(self.submit_times[job_id])
+        start_time = float(self.start_times[job_id])
+
+        return {
+                "job name": self.job_names[job_id],
+                "trace": [], # [co-job, start time, end time]
+                "speedups": [], # [sp1, sp2, ..]
+                "cores": dict(), # {cojob1: cores1, cojob2: cores2, ..}
+                "assigned procs": reduce(lambda pA, pB: pA.union(pB), psets, ProcSet()),
+                "hosts": {hostname for hostname, _ in allocations},
+                "remaining time": [],
+                "start time": start_time,
+                "finish time": float(self.finish_times[job_id]),
+                "submit time": submit_time,
+                "waiting time": start_time - submit_time,
+                "wall time": float(self.wall_times[job_id]),
+                "num of processes": int(self.num_of_processes[job_id])
+        }
+
+    def __getstate__(self):
+        # The materialized view of the job events is rebuilt on demand
+        state = dict(self.__dict__)
+        state["_Logger__job_events"] = None
+        return state
+
+    def invalidate_job_events(self) -> None:
+        """Drop the materialized view after the columns were written directly
+        """
+        self.__job_events = None
+
+    @property
+    def job_events(self) -> dict[int, dict]:
+        """The events of each job by job id as dictionaries. The view is only
+        materialized from the columns when an action asks for it and is kept
+        until the next recorded event.
+        """
+        if self.__job_events is None:
+            self.__job_events = {job_id: self.get_job_events(job_id)
+                                 for job_id in range(self.jobs_num)}
+        return self.__job_events
+
+    def get_gantt_rectangles(self) -> tuple[np.ndarray, list[str], np.ndarray]:
+        """Return the rectangles of the Gantt plot, one for each contiguous
+        interval of cores of each job, as a (rectangles, 5) array of job id,
+        start time, finish time, first and last core, along with the signature
+        and the hover data of each rectangle's job
+        """
+        rects = list()
+        labels = list()
+        hover = list()
+
+        for job_id, allocation in self.allocations.items():
+            procs = ProcSet(*[pset for _, psets in allocation for pset in psets])
+            start_time = self.start_times[job_id]
+            finish_time = self.finish_times[job_id]
+            submit_time = self.submit_times[job_id]
+            signature = f"{job_id}:{self.job_names[job_id]}"
+
+            for interval in procs.intervals():
+                rects.append((job_id, start_time, finish_time, interval.inf, interval.sup))
+                labels.append(signature)
+                hover.append((submit_time, start_time, finish_time, start_time - submit_time, len(allocation)))
+
+        return np.array(rects, dtype=float).reshape(-1, 5), labels, np.array(hover, dtype=float).reshape(-1, 5)
 
     def get_gantt_representation(self):
 
-        # Create the color palette for each job
-        num_of_jobs = len(list(self.job_events.keys()))
-        jcolors = colors.sample_colorscale(self.scale, [n/(num_of_jobs - 1) for n in range(num_of_jobs)])
+        rects, labels, hover = self.get_gantt_rectangles()
 
         # Create data for figure
-        fig_data = list()
-
-        for idx, [key, jevt] in enumerate(self.job_events.items()):
-
-            for interval in jevt["assigned procs"].intervals():
-                x_min = jevt["start time"]
-                x_max = jevt["finish time"]
-                y_min = interval.inf
-                y_max = interval.sup
-
-                xs = [x_min, x_max, x_max, x_min, x_min]
-                ys = [y_min, y_min, y_max, y_max, y_min]
-
-                fig_data.append(go.Scatter(
-                    x=xs,
-                    y=ys,
-                    mode="lines",
-                    legendgroup=key,
-                    line=dict(width=0.1, color="black"),
-                    fill="toself",
-                    fillcolor=jcolors[idx],
-                    showlegend=False,
-                    name=f"<b>{key}</b><br>"+
-                    f"submit time = {jevt['submit time']:.2f} s<br>"+
-                    f"start time = {jevt['start time']:.2f} s<br>"+
-                    f"finish time = {jevt['finish time']:.2f} s<br>"+
-                    f"waiting time = {jevt['waiting time']:.2f} s<br>"+
-                    f"hosts = {len(jevt['hosts'])}<br>"+
-                    f"processors = {len(jevt['assigned procs'])}",
-                ))
+        fig_data = gantt_traces(rects, labels, hover, self.jobs_num, self.scale)
 
         xaxis_tickvals = [i * (self.cluster.makespan / 10) for i in range(0, 11)]
         xaxis_ticktext = [str(timedelta(seconds=i)).split('.')[0] for i in xaxis_tickvals]
@@ -183,6 +269,13 @@ class Logger(object):
         )
         return fig.to_json()
 
+    def get_gantt_image(self, width: int = 2048, height: int = 1024) -> np.ndarray:
+        """Rasterize the Gantt plot into an RGB image
+        """
+        rects, _, _ = self.get_gantt_rectangles()
+        return rasterize_gantt(rects, self.jobs_num, self.scale, self.cluster.makespan,
+                               self.cluster.total_cores, width, height)
+
     def get_jobs_utilization(self, logger):
         """Get different utilization metrics for each job in comparison to
         another (common use: default scheduling) logger
@@ -194,45 +287,41 @@ class Logger(object):
         # Boxplot points
         points = dict()
 
-        for job_sig in self.job_events:
+        for job_id in self.job_events:
 
             # Utilization numbers
             job_points = {
-                "speedup": (logger.job_events[job_sig]["finish time"] - logger.job_events[job_sig]["start time"]) / (self.job_events[job_sig]["finish time"] -self.job_events[job_sig]["start time"]),
-                "turnaround": (logger.job_events[job_sig]["finish time"] - logger.job_events[job_sig]["submit time"]) / (self.job_events[job_sig]["finish time"] -self.job_events[job_sig]["submit time"]),
-                "waiting": logger.job_events[job_sig]["waiting time"] - self.job_events[job_sig]["waiting time"]
+                "speedup": (logger.job_events[job_id]["finish time"] - logger.job_events[job_id]["start time"]) / (self.job_events[job_id]["finish time"] -self.job_events[job_id]["start time"]),
+                "turnaround": (logger.job_events[job_id]["finish time"] - logger.job_events[job_id]["submit time"]) / (self.job_events[job_id]["finish time"] -self.job_events[job_id]["submit time"]),
+                "waiting": logger.job_events[job_id]["waiting time"] - self.job_events[job_id]["waiting time"]
             }
 
-            points[job_sig] = job_points
+            points[job_id] = job_points
 
         return points
 
     def get_waiting_queue_graph(self):
-        num_of_jobs: list[int] = list()
-        for check in sorted(list(self.cluster_events["checkpoints"])):
-            jobs_in_check = 0
-            for _, jevt in self.job_events.items():
-                if jevt["submit time"] <= check and jevt["start time"] > check:
-                    jobs_in_check += 1
-            num_of_jobs.append(jobs_in_check)
+        checkpoints = np.sort(self.cluster_events["checkpoints"])
+        submit_times = self.submit_times[:self.jobs_num]
+        start_times = self.start_times[:self.jobs_num]
+
+        # A job is waiting at the checkpoints in [submit time, start time)
+        waited = start_times > submit_times
+        submitted = np.searchsorted(np.sort(submit_times[waited]), checkpoints, side="right")
+        started = np.searchsorted(np.sort(start_times[waited]), checkpoints, side="right")
 
         return (
-                sorted(list(self.cluster_events["checkpoints"])),
-                num_of_jobs
+                checkpoints.tolist(),
+                (submitted - started).tolist()
         )
 
     def get_jobs_throughput(self):
-        num_of_jobs: list[int] = list()
-        for check in sorted(list(self.cluster_events["checkpoints"])):
-            jobs_in_check = 0
-            for _, jevt in self.job_events.items():
-                if jevt["finish time"] <= check:
-                    jobs_in_check += 1
-            num_of_jobs.append(jobs_in_check)
+        checkpoints = np.sort(self.cluster_events["checkpoints"])
+        finish_times = np.sort(self.finish_times[:self.jobs_num])
 
         return (
-                sorted(list(self.cluster_events["checkpoints"])),
-                num_of_jobs
+                checkpoints.tolist(),
+                np.searchsorted(finish_times, checkpoints, side="right").tolist()
         )
 
     def get_unused_cores_graph(self):
@@ -242,8 +331,9 @@ class Logger(object):
                 self.cluster_events["unused cores"]
         )
 
-    def get_workload(self):
-        """Return 1-5 and 9 fields frm the Standart Workload Format
+    def write_workload(self, fd: TextIO) -> None:
+        """Write 1-5 and 9 fields of the Standart Workload Format as CSV to a
+        file handle one job at a time
         """
 
         header = "Job Number,"
@@ -252,164 +342,130 @@ class Logger(object):
         header += "Requested Number of Processors,Requested Time,Requested Memory," # Requested resources
         header += "Status,User ID,Group ID,Executable Number," # Assign job_name
         header += "Queue Number,Partition Number,Preceding Job Number,Think Time from Preceding Job\n" # Irrelevant for us
+        fd.write(header)
+
+        columns = zip(self.submit_times[:self.jobs_num].tolist(),
+                      self.start_times[:self.jobs_num].tolist(),
+                      self.finish_times[:self.jobs_num].tolist(),
+                      self.assigned_cores[:self.jobs_num].tolist(),
+                      self.num_of_processes[:self.jobs_num].tolist(),
+                      self.wall_times[:self.jobs_num].tolist(),
+                      self.job_names)
+
+        for job_id, (submit_time, start_time, finish_time, cores, procs, wall_time, job_name) in enumerate(columns):
+            fd.write(f"{job_id},"
+                     f"{submit_time},{start_time - submit_time},{finish_time - start_time},"
+                     f"{cores},,,"
+                     f"{procs},{wall_time},,"
+                     f"1,,,{job_name},"
+                     f",,,\n")
 
-        workload = ""
-        for jevt_id, jevt in self.job_events.items():
-            job_id, job_name = jevt_id.split(':')
-            workload += f"{job_id},"
-            workload += f"{jevt['submit time']},{jevt['waiting time']},{jevt['finish time']-jevt['start time']},"
-            workload += f"{len(jevt['assigned procs'])},,,"
-            workload += f"{jevt['num of processes']},{jevt['wall time']},,"
-            workload += f"1,,,{job_name},"
-            workload += f",,,\n"
+    def get_workload(self):
+        """Return 1-5 and 9 fields frm the Standart Workload Format
+        """
+        buffer = io.StringIO()
+        self.write_workload(buffer)
+        return buffer.getvalue()
 
-        return header + workload
+    def get_workload_array(self) -> np.ndarray:
+        """Return the fields of the workload as a structured array with a
+        record per job
+        """
+        names = self.job_names[:self.jobs_num]
+        name_len = max([len(name) for name in names], default=1)
+
+        workload = np.zeros(self.jobs_num, dtype=[
+            ("Job Number", np.int64),
+            ("Submit Time", np.float64),
+            ("Wait Time", np.float64),
+            ("Run Time", np.float64),
+            ("Number of Allocated Processors", np.int64),
+            ("Requested Number of Processors", np.int64),
+            ("Requested Time", np.float64),
+            ("Executable Number", f"U{max(name_len, 1)}")
+        ])
+
+        submit_times = self.submit_times[:self.jobs_num]
+        start_times = self.start_times[:self.jobs_num]
+
+        workload["Job Number"] = np.arange(self.jobs_num)
+        workload["Submit Time"] = submit_times
+        workload["Wait Time"] = start_times - submit_times
+        workload["Run Time"] = self.finish_times[:self.jobs_num] - start_times
+        workload["Number of Allocated Processors"] = self.assigned_cores[:self.jobs_num]
+        workload["Requested Number of Processors"] = self.num_of_processes[:self.jobs_num]
+        workload["Requested Time"] = self.wall_times[:self.jobs_num]
+        workload["Executable Number"] = names
+
+        return workload
+
+    def save_workload_array(self, path: str) -> None:
+        """Store the workload as a .npy file that can be memory-mapped with
+        np.load(path, mmap_mode="r")
+        """
+        np.save(path, self.get_workload_array())
+
+    def get_cluster_occupancy(self, times: list) -> Iterator[np.ndarray]:
+        """Yield for each of the sorted times the id of the job that occupies
+        each core of the cluster or FREE_CORE
+        """
+
+        # The start and finish events of the jobs with the core intervals they
+        # paint; at the same time finish events come first
+        events = list()
+        for job_id, allocation in self.allocations.items():
+            start_time = self.start_times[job_id]
+            finish_time = self.finish_times[job_id]
+            if not finish_time > start_time:
+                continue
+
+            intervals = [(interval.inf - 1, interval.sup)
+                         for _, psets in allocation
+                         for pset in psets
+                         for interval in pset.intervals()]
+            events.append((start_time, 1, job_id, intervals))
+            events.append((finish_time, 0, job_id, intervals))
+
+        events.sort(key=lambda event: (event[0], event[1]))
+
+        frame = np.full(self.cluster.total_cores, FREE_CORE, dtype=np.int64)
+        idx = 0
+        for check in times:
+            while idx < len(events) and events[idx][0] <= check:
+                _, starts, job_id, intervals = events[idx]
+                value = job_id if starts else FREE_CORE
+                for first, last in intervals:
+                    frame[first:last] = value
+                idx += 1
+
+            yield frame.copy()
 
     def get_animated_cluster(self):
-        """Animate the different jobs allocating cores in a cluster
+        """Animate the different jobs allocating cores in a cluster. The
+        number of frames is limited by animation_frames and the frames are
+        stored as delta frames if animation_delta is set.
         """
 
         hosts = sorted(list(self.cluster.hosts.keys()), key=lambda name: int(name.replace("host", "")))
-        num_of_hosts = len(hosts)
         ppn = sum(self.cluster.socket_conf)
-        cores = list(range(1, ppn+1))
-        core_ticks = [x for x in cores]
-        core_ticknames = [f"Core {x}" for x in cores]
-
-        num_of_jobs = len(list(self.job_events.keys()))
-        jcolors = colors.sample_colorscale(self.scale, [n/(num_of_jobs - 1) for n in range(num_of_jobs)])
-
-        frames = []
-        checkpoints = sorted(list(self.cluster_events["checkpoints"]))
-
-        for check in checkpoints:
-
-            cluster_flat = [-100] * (num_of_hosts * ppn)
-            jobnames_flat = [""] * (num_of_hosts * ppn)
-
-            for idx, [key, jevt] in enumerate(self.job_events.items()):
-
-                if jevt["start time"] <= check and jevt["finish time"] > check:
-                    idx, name = key.split(":")
-                    assigned_procs = list(jevt["assigned procs"])
-                    for proc in assigned_procs:
-                        cluster_flat[proc-1] = int(idx)
-                        jobnames_flat[proc-1] = f"{idx}:{name}"
-
-            cluster = list()
-            host = list()
-            cluster_text = list()
-            host_text = list()
-            for i, val in enumerate(cluster_flat):
-                host.append(val)
-                host_text.append(jobnames_flat[i])
-                if (i+1) % ppn == 0:
-                    cluster.append(host)
-                    host = list()
-                    cluster_text.append(host_text)
-                    host_text = list()
-
-            frames.append(
-                    go.Frame(data=[
-                        go.Heatmap(
-                            z=cluster, 
-                            x=cores, 
-                            y=hosts, 
-                            xgap=3, 
-                            ygap=3, 
-                            colorscale=jcolors, 
-                            zmin=0, 
-                            zmax=num_of_jobs-1, 
-                            text=cluster_text,
-                            hovertemplate="Job: %{text}<br>%{x}<br>%{y}<extra></extra>"
-                        )
-                    ], name=str(check)) #, name=f"frame{i}")
-            )
-
-        fig = go.Figure(
-                data=[
-                    go.Heatmap(
-                        z=[[-100] * ppn] * num_of_hosts, 
-                        x=cores, 
-                        y=hosts, 
-                        xgap=3, 
-                        ygap=3, 
-                        colorscale=jcolors, 
-                        zmin=0, 
-                        zmax=num_of_jobs-1, 
-                        text=[[""] * ppn] * num_of_hosts,
-                        hovertemplate="Job: %{text}<br>%{x}<br>%{y}<extra></extra>"
-                    )
-                ],
-                layout=go.Layout(
-                    title=f"<b>Cluster history: {self.scheduler.name}",
-                    title_x=0.5,
-                    xaxis=dict(
-                        tickmode="array",
-                        tickvals=core_ticks,
-                        ticktext=core_ticknames
-                    ),
-                    updatemenus=[{
-                        "buttons": [
-                            {
-                                "args": [
-                                    None, 
-                                    {
-                                        "frame": {"duration": 500, "redraw": True},
-                                        "fromcurrent": True,
-                                        "transition": {"duration": 300}
-                                    }
-                                ],
-                                "label": "Play",
-                                "method": "animate"
-                            },
-                            {
-                                "args": [
-                                    [None],
-                                    {
-                                        "frame": {"duration": 0, "redraw": True},
-                                        "mode": "immediate",
-                                        "transition": {"duration": 0}
-                                    }
-                                ],
-                                "label": "Pause",
-                                "method": "animate"
-                            }
-                        ],
-                        "direction": "left",
-                        'pad': {'r': 10, 't': 87},
-                        "showactive": False,
-                        "type": "buttons",
-                        "x": 0.04,
-                        "xanchor": "center",
-                        "y": 0.029,
-                        "yanchor": "top"
-                    }],
-                    sliders=[{
-                        'active': 0,
-                        'yanchor': 'top',
-                        'xanchor': 'left',
-                        'currentvalue': {
-                            'prefix': 'Time:',
-                            'visible': True,
-                            'xanchor': 'right'
-                        },
-                        'transition': {'duration': 300, 'easing': 'cubic-in-out'},
-                        'pad': {'b': 10},
-                        'len': 0.9,
-                        'x': 0.1,
-                        'y': -0.01,
-                        'steps': [{
-                            'args': [
-                                [str(t)],
-                                {'frame': {'duration': 0, 'redraw': True}, 'mode': 'immediate', 'transition': {'duration': 0}}
-                            ],
-                            'label': str(t),
-                            'method': 'animate'
-                        } for t in checkpoints]
-                    }]
-                ),
-                frames=frames
-        )
-
-        return fig.to_json()
+        title = f"<b>Cluster history: {self.scheduler.name}"
+
+        checkpoints = sorted(self.cluster_events["checkpoints"])
+        times = select_frame_times(checkpoints, self.animation_frames)
+        frames = self.get_cluster_occupancy(times)
+
+        labels = {job_id: f"{job_id}:{self.job_names[job_id]}" for job_id in self.allocations}
+
+        if self.animation_delta:
+            return json.dumps({
+                "encoding": "delta",
+                "title": title,
+                "hosts": hosts,
+                "ppn": ppn,
+                "times": times,
+                "labels": labels,
+                "num of jobs": self.jobs_num,
+                "deltas": encode_delta_frames(frames)
+            })
+
+        return animated_cluster_figure(title, hosts, ppn, times, frames, labels, self.jobs_num).to_json()
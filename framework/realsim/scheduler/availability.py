@@ -0,0 +1,110 @@
+"""
+The availability profile stores how many nodes of the cluster are free along
+the simulated time as a sequence of step segments. Segment i starts at
+times[i], lasts until times[i+1] (the last one never ends) and has free[i]
+nodes available.
+
+Schedulers that hold reservations, like conservative backfilling, use it to
+find the earliest time a job fits and to book the nodes of a job for the
+duration of its wall time.
+"""
+
+from bisect import bisect_left, bisect_right
+from math import inf
+
+
+class AvailabilityProfile:
+
+    def __init__(self, free_nodes: int, start_time: float = 0):
+
+        # The starting times of the segments in increasing order
+        self.times: list[float] = [start_time]
+
+        # The free nodes of each segment
+        self.free: list[int] = [free_nodes]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def copy(self) -> "AvailabilityProfile":
+        profile = AvailabilityProfile.__new__(AvailabilityProfile)
+        profile.times = list(self.times)
+        profile.free = list(self.free)
+        return profile
+
+    def split(self, time: float) -> int:
+        """Make sure that a segment starts at time and return its index
+        """
+        idx = bisect_left(self.times, time)
+        if idx < len(self.times) and self.times[idx] == time:
+            return idx
+
+        # The new segment inherits the free nodes of the one it splits
+        self.times.insert(idx, time)
+        self.free.insert(idx, self.free[idx - 1])
+        return idx
+
+    def advance(self, time: float) -> None:
+        """Forget the segments that ended before time
+        """
+        idx = bisect_right(self.times, time) - 1
+        if idx > 0:
+            del self.times[:idx]
+            del self.free[:idx]
+        self.times[0] = max(self.times[0], time)
+
+    def update(self, start_time: float, duration: float, nodes: int) -> None:
+        """Add nodes to (or remove them with a negative value from) the
+        segments between start_time and start_time + duration
+        """
+        # The part of the segments that was already forgotten is not updated
+        # but the end does not move
+        end_time = start_time + duration
+        start_time = max(start_time, self.times[0])
+        if not end_time > start_time:
+            return
+
+        first = self.split(start_time)
+        last = self.split(end_time) if end_time < inf else len(self.times)
+
+        for idx in range(first, last):
+            self.free[idx] += nodes
+
+    def reserve(self, start_time: float, duration: float, nodes: int) -> None:
+        self.update(start_time, duration, -nodes)
+
+    def release(self, start_time: float, duration: float, nodes: int) -> None:
+        self.update(start_time, duration, nodes)
+
+    def earliest_fit(self, nodes: int, duration: float, after: float = -inf) -> float:
+        """Return the earliest time, not before after, that nodes are free for
+        the whole duration or inf if there is no such time
+        """
+        times, free = self.times, self.free
+        size = len(times)
+        idx = max(bisect_right(times, after) - 1, 0)
+
+        while idx < size:
+
+            # A window can only start at a segment with enough free nodes
+            if free[idx] < nodes:
+                idx += 1
+                continue
+
+            start_time = times[idx] if times[idx] > after else after
+            end_time = start_time + duration
+
+            # Check that the rest of the segments overlapping the window have
+            # enough free nodes
+            jdx = idx + 1
+            while jdx < size and times[jdx] < end_time:
+                if free[jdx] < nodes:
+                    break
+                jdx += 1
+            else:
+                return start_time
+
+            # Restart the search after the segment that did not fit
+            idx = jdx + 1
+
+        return inf
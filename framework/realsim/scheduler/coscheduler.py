@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
 
+import numpy as np
 import os
 import sys
 
@@ -26,34 +27,59 @@ class Coscheduler(Scheduler, ABC):
     def __init__(self):
         Scheduler.__init__(self)
 
+        # Cache of the co-location scores for the current simulation step
+        # keyed by the job name and the occupancy of a host
+        self.scores_cache: dict[tuple[str, tuple[str, ...]], object] = dict()
+        self.scores_time: float = -1
+
     @abstractmethod
     def setup(self) -> None:
         pass
 
-    def host_alloc_condition(self, hostname: str, job: Job) -> float:
+    def snapshot_state(self) -> dict:
+        # The co-location scores are cached only for the current step
+        state = Scheduler.snapshot_state(self)
+        state["scores_cache"] = dict()
+        state["scores_time"] = -1
+        return state
+
+    def coloc_score(self, job: Job, co_job_names: tuple[str, ...]):
         """Condition on how to sort the hosts based on the speedup that the job
-        will gain/lose. Always spread first
+        will gain/lose next to the co-jobs of a host. Always spread first. The
+        score may only depend on the names of the jobs.
         """
 
-        co_job_sigs = list(self.cluster.hosts[hostname].jobs.keys())
-
-        # If no signatures then spread
-        if co_job_sigs == []:
+        # If no co-jobs then spread
+        if co_job_names == ():
             return job.max_speedup
 
-        # Get the worst possible speedup
-        first_co_job_name = co_job_sigs[0].split(":")[-1]
-        worst_speedup = self.database.heatmap[job.job_name][first_co_job_name]
-        worst_speedup = worst_speedup if worst_speedup is not None else 1
+        # Get the worst possible speedup; unknown speedups count as 1
+        speedups = self.database.get_speedups(job.job_name, list(co_job_names))
+        return float(np.nan_to_num(speedups, nan=1).min())
+
+    def host_alloc_condition(self, hostname: str, job: Job):
+        """Score a host by the names of the jobs executing on it
+        """
+        return self.coloc_score(job, self.cluster.host_occupancy[hostname])
+
+    def host_alloc_scores(self, hostnames: list[str], job: Job) -> np.ndarray:
+        """Batch version of host_alloc_condition; the score is evaluated once
+        for each distinct occupancy of the hosts
+        """
+
+        if self.scores_time != self.cluster.makespan:
+            self.scores_cache = dict()
+            self.scores_time = self.cluster.makespan
 
-        for co_job_sig in co_job_sigs[1:]:
-            co_job_name = co_job_sig.split(":")[-1]
-            speedup = self.database.heatmap[job.job_name][co_job_name]
-            speedup = speedup if speedup is not None else 1
-            if speedup < worst_speedup:
-                worst_speedup = speedup
+        scores = list()
+        for hostname in hostnames:
+            key = (job.job_name, self.cluster.host_occupancy[hostname])
+            score = self.scores_cache.get(key)
+            if score is None:
+                score = self.scores_cache[key] = self.coloc_score(job, key[1])
+            scores.append(score)
 
-        return worst_speedup
+        return np.array(scores, dtype=float).reshape(len(hostnames), -1)
 
     @abstractmethod
     def deploy(self) -> bool:
@@ -1,3 +1,4 @@
+import numpy as np
 import os
 import sys
 
@@ -6,7 +7,6 @@ sys.path.append(os.path.abspath(os.path.join(
 )))
 
 from realsim.jobs.jobs import Job
-from realsim.jobs.utils import deepcopy_list
 from realsim.scheduler.coschedulers.ranks.ranks import RanksCoscheduler
 from realsim.cluster.host import Host
 
@@ -20,5 +20,11 @@ class RandomRanksCoscheduler(RanksCoscheduler):
     def host_alloc_condition(self, hostname: str, job: Job) -> float:
         return float(self.cluster.hosts[hostname].state != Host.IDLE)
 
+    def host_alloc_scores(self, hostnames: list[str], job: Job) -> np.ndarray:
+        """Batch version of host_alloc_condition
+        """
+        return np.array([self.cluster.hosts[hostname].state != Host.IDLE
+                         for hostname in hostnames], dtype=float).reshape(-1, 1)
+
     # def backfill(self) -> bool:
     #     return False
@@ -6,12 +6,12 @@ sys.path.append(os.path.abspath(os.path.join(
 )))
 
 from realsim.jobs.jobs import Job
-from realsim.jobs.utils import deepcopy_list
 from realsim.scheduler.coscheduler import Coscheduler
 from realsim.cluster.host import Host
 
 from abc import ABC
 from math import inf
+import numpy as np
 
 
 class RanksCoscheduler(Coscheduler, ABC):
@@ -28,26 +28,60 @@ class RanksCoscheduler(Coscheduler, ABC):
         self.ranks : dict[int, int] = dict() # jobId --> number of good pairings
         self.ranks_threshold = 1.0
 
+        # The interned names of the jobs that are currently ranked
+        self.ranked_name_ids : dict[int, int] = dict() # jobId --> name id
+
+    def good_pairs(self, name_ids: np.ndarray, co_name_ids: np.ndarray) -> np.ndarray:
+        """Return a boolean matrix of which pairs of jobs are good pairs. A pair
+        is good if its average speedup is above the threshold; pairs with an
+        unknown speedup (NaN) are never good.
+        """
+        speedups = self.database.speedups[np.ix_(name_ids, co_name_ids)]
+        co_speedups = self.database.speedups[np.ix_(co_name_ids, name_ids)]
+        return (speedups + co_speedups.T) / 2 > self.ranks_threshold
+
     def update_ranks(self):
+        """Update the ranks incrementally for the jobs that left or entered the
+        waiting queue since the last update
+        """
+
+        waiting_ids = {job.job_id for job in self.cluster.waiting_queue}
+
+        left_ids = [job_id for job_id in self.ranked_name_ids if job_id not in waiting_ids]
+        for job_id in left_ids:
+            self.ranks.pop(job_id)
 
-        self.ranks = {job.job_id : 0 for job in self.cluster.waiting_queue}
+        entered_jobs = [job for job in self.cluster.waiting_queue if job.job_id not in self.ranked_name_ids]
 
-        # Update ranks for each job
-        for i, job in enumerate(self.cluster.waiting_queue):
+        # The jobs that remain lose the good pairs they had with the jobs that
+        # left the waiting queue
+        if left_ids != []:
+            left_name_ids = np.array([self.ranked_name_ids.pop(job_id) for job_id in left_ids], dtype=np.intp)
+            if self.ranked_name_ids != {}:
+                lost = self.good_pairs(left_name_ids, np.fromiter(self.ranked_name_ids.values(), dtype=np.intp)).sum(axis=0)
+                for job_id, rank in zip(self.ranked_name_ids, lost.tolist()):
+                    self.ranks[job_id] -= rank
 
-            for co_job in self.cluster.waiting_queue[i+1:]:
+        if entered_jobs == []:
+            return
 
-                job_speedup = self.database.heatmap[job.job_name][co_job.job_name]
-                co_job_speedup = self.database.heatmap[co_job.job_name][job.job_name]
+        entered_ids = [job.job_id for job in entered_jobs]
+        entered_name_ids = self.database.get_name_ids([job.job_name for job in entered_jobs])
 
-                if job_speedup is None or co_job_speedup is None:
-                    continue
+        # Good pairs among the jobs that entered the waiting queue
+        pairs = np.triu(self.good_pairs(entered_name_ids, entered_name_ids), k=1)
+        entered_ranks = pairs.sum(axis=0) + pairs.sum(axis=1)
 
-                avg_speedup = (job_speedup + co_job_speedup) / 2
+        # Good pairs between the jobs that entered and the jobs that remain
+        if self.ranked_name_ids != {}:
+            pairs = self.good_pairs(entered_name_ids, np.fromiter(self.ranked_name_ids.values(), dtype=np.intp))
+            entered_ranks += pairs.sum(axis=1)
+            for job_id, rank in zip(self.ranked_name_ids, pairs.sum(axis=0).tolist()):
+                self.ranks[job_id] += rank
 
-                if avg_speedup > self.ranks_threshold:
-                    self.ranks[job.job_id] += 1
-                    self.ranks[co_job.job_id] += 1
+        for job_id, name_id, rank in zip(entered_ids, entered_name_ids.tolist(), entered_ranks.tolist()):
+            self.ranks[job_id] = rank
+            self.ranked_name_ids[job_id] = name_id
 
     def setup(self):
 
@@ -55,6 +89,8 @@ class RanksCoscheduler(Coscheduler, ABC):
         Coscheduler.setup(self)
 
         # Create ranks
+        self.ranks = dict()
+        self.ranked_name_ids = dict()
         self.update_ranks()
 
     def after_deployment(self, *args):
@@ -75,9 +111,9 @@ class RanksCoscheduler(Coscheduler, ABC):
         deployed = False
 
         # Update the rank of each job before scheduling them
-        # self.update_ranks()
+        self.update_ranks()
 
-        waiting_queue = deepcopy_list(self.cluster.waiting_queue[:self.queue_depth])
+        waiting_queue = self.cluster.waiting_queue[:self.queue_depth]
         waiting_queue.sort(key=lambda job: self.waiting_queue_reorder(job),
                            reverse=True)
 
@@ -104,15 +140,9 @@ class RanksCoscheduler(Coscheduler, ABC):
 
         blocked_job = self.cluster.waiting_queue[0]
 
-        execution_list = deepcopy_list(self.cluster.execution_list)
-        execution_list.sort(key=lambda job: job.wall_time + job.start_time - self.cluster.makespan)
-
-
-        # Get all the idle hosts
-        suitable_nodeprocs, _ = self.find_suitable_nodes(blocked_job.num_of_processes, self.cluster.half_socket_allocation)
 
-        # Get suitable hosts from names
-        suitable_hosts = list(suitable_nodeprocs.keys())
+        # Get all the suitable hosts
+        suitable_hosts, _ = self.find_suitable_hosts(blocked_job.num_of_processes, self.cluster.half_socket_allocation)
 
         # Find the minimum estimated start time of the job
 
@@ -121,7 +151,7 @@ class RanksCoscheduler(Coscheduler, ABC):
 
         min_estimated_time = inf
 
-        for xjob in execution_list:
+        for xjob in self.cluster.get_running_jobs_by_end():
 
             aggr_hosts = aggr_hosts.union(xjob.assigned_hosts)
 
@@ -137,7 +167,7 @@ class RanksCoscheduler(Coscheduler, ABC):
         # Find job(s) that can backfill the execution list
 
         # Get the backfilling candidates
-        backfilling_jobs = deepcopy_list(self.cluster.waiting_queue[1:self.backfill_depth+1])
+        backfilling_jobs = self.cluster.waiting_queue[1:self.backfill_depth+1]
 
         # Ascending sorting by their wall time
         #backfilling_jobs.sort(key=lambda b_job: b_job.wall_time)
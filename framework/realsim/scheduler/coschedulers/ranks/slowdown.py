@@ -2,6 +2,7 @@ from abc import ABC
 from numpy.random import seed, randint
 from time import time_ns
 from math import inf
+import numpy as np
 import os
 import sys
 
@@ -23,26 +24,23 @@ class SlowdownRanksCoscheduler(RanksCoscheduler):
         # return float(randint(len(self.cluster.waiting_queue)))
 	    return 1.0
 
-    def host_alloc_condition(self, hostname: str, job: Job):
+    def coloc_score(self, job: Job, co_job_names: tuple[str, ...]):
         """Condition on how to sort the hosts based on the speedup that the job
         will gain/lose. Always spread first
         """
 
-        # get the jobs signatures that are assinged to the host
-        co_job_sigs = list(self.cluster.hosts[hostname].jobs.keys())
-
-        # If no signatures then spread
-        if co_job_sigs == []:
+        # If no co-jobs then spread
+        if co_job_names == ():
             return (inf, job.max_speedup)
 
-        # get average speedup for each job in host + candidate job
-        speedup = list(map(lambda j: self.database.heatmap[job.job_name][j.split(":")[-1]],co_job_sigs))
-        speedup += list(map(lambda j: self.database.heatmap[j.split(":")[-1]][job.job_name],co_job_sigs))
-        avg_speedup = sum(speedup) / (len(co_job_sigs)*2)
+        # get average speedup for each job in host + candidate job; unknown
+        # speedups count as 1
+        speedup = np.concatenate((self.database.get_speedups(job.job_name, list(co_job_names)),
+                                  self.database.get_speedups(list(co_job_names), job.job_name)))
+        speedup = np.nan_to_num(speedup, nan=1)
+        avg_speedup = float(speedup.sum()) / (len(co_job_names)*2)
 
         # get how many of the speedup values of pairs job,x and x,job for each x in host are bellow threshold
-        jobs_with_speedup = list(filter(lambda j: self.database.heatmap[job.job_name][j.split(":")[-1]] >= 1,co_job_sigs))
-        jobs_with_speedup += list(filter(lambda j: self.database.heatmap[j.split(":")[-1]][job.job_name] >= 1,co_job_sigs))
-        speedup_counts = len(jobs_with_speedup)
+        speedup_counts = int(np.count_nonzero(speedup >= 1))
 
         return (speedup_counts, avg_speedup)
@@ -5,11 +5,12 @@ import sys
 from functools import partial, reduce
 from itertools import islice
 from typing import TYPE_CHECKING, Optional
-from math import ceil
+from math import ceil, inf
 
 from concurrent.futures import ProcessPoolExecutor, wait
 from multiprocessing import Manager, cpu_count
 
+import numpy as np
 from procset import ProcSet
 
 realsim_path = os.path.abspath(
@@ -81,6 +82,34 @@ class Scheduler(ABC):
         self.backfill_enabled: bool = False # The most basic algorithm will not use backfill
         self.backfill_depth = 100 # How far we reach for backfilling
 
+        # The changes of the cluster state (see Cluster.get_state_version)
+        # since the start of the last pass that may let the scheduler deploy
+        # jobs; passes without any of them are skipped. The deployments of a
+        # pass count since they can change the order or the window of the
+        # waiting jobs that the next pass considers
+        self.triggers: set[str] = {"arrivals", "deploys", "releases"}
+
+        # The simulated time that a pass may deploy jobs even if the cluster
+        # state did not change, for schedulers that hold time bound bookings
+        self.next_pass_time: float = inf
+
+    def snapshot_state(self) -> dict:
+        """The state of the scheduler that a snapshot of the simulation keeps;
+        schedulers drop what they can rebuild on demand
+        """
+        return dict(self.__dict__)
+
+    def restore_state(self, state: dict) -> None:
+        """Restore the state of the scheduler from a snapshot
+        """
+        self.__dict__.update(state)
+
+    def __getstate__(self):
+        return self.snapshot_state()
+
+    def __setstate__(self, state):
+        self.restore_state(state)
+
     def oldest_find_suitable_nodes(self, 
                             req_cores: int, 
                             socket_conf: tuple) -> dict[str, list[ProcSet]]:
@@ -108,6 +137,26 @@ class Scheduler(ABC):
         else:
             return {}
 
+    def find_suitable_hosts(self,
+                            req_cores: int,
+                            socket_conf: tuple,
+                            immediate=False) -> tuple[list[str], bool]:
+        """ Returns the names of the hosts that a job can use as resources and
+        whether they cover the required cores
+        + req_cores   : required cores for the job
+        + socket_conf : under a certain socket mapping/configuration
+        """
+        cores_per_host = sum(socket_conf)
+
+        # If immediate then only the first hosts that cover the required
+        # cores are needed
+        num_of_hosts = ceil(req_cores / cores_per_host) if immediate else None
+
+        # Only the hosts with enough free cores per socket are queried
+        hostnames = self.cluster.get_suitable_hosts(socket_conf, num_of_hosts)
+
+        return hostnames, len(hostnames) * cores_per_host >= req_cores
+
     def find_suitable_nodes(self, 
                             req_cores: int, 
                             socket_conf: tuple,
@@ -116,27 +165,14 @@ class Scheduler(ABC):
         + req_cores   : required cores for the job
         + socket_conf : under a certain socket mapping/configuration
         """
-        cores_per_host = sum(socket_conf)
-        to_be_allocated = dict()
-        for hostname, host in self.cluster.hosts.items():
-            host_sockets = host.sockets
-            # If under the specifications of the required cores and socket 
-            # allocation *takes advantage of short circuit for idle hosts
-            if host.state == Host.IDLE or all(x[0] <= len(x[1]) for x in zip(socket_conf, host.sockets)):
-                req_cores -= cores_per_host
-                # to_be_allocated.update({hostname: [
-                #     ProcSet.from_str(' '.join([str(x) for x in p_set[:socket_conf[i]]]))
-                #     for i, p_set in enumerate(host.sockets)]
-                # })
-                to_be_allocated[hostname] = [
-                    ProcSet.from_str(' '.join(map(str, p_set[:socket_conf[i]])))
-                    for i, p_set in enumerate(host_sockets)
-                ]
-                if immediate:
-                    if req_cores <= 0:
-                        return to_be_allocated, True
-
-        return to_be_allocated, req_cores <= 0
+        hostnames, req_okay = self.find_suitable_hosts(req_cores, socket_conf, immediate=immediate)
+
+        to_be_allocated = {
+                hostname: self.cluster.hosts[hostname].get_free_psets(socket_conf)
+                for hostname in hostnames
+        }
+
+        return to_be_allocated, req_okay
 
     def old_find_suitable_nodes(self, 
                             req_cores: int, 
@@ -202,6 +238,40 @@ class Scheduler(ABC):
         """
         return 1.0
 
+    def host_alloc_scores(self, hostnames: list[str], job: Job) -> np.ndarray:
+        """Batch version of host_alloc_condition for a list of candidate
+        hosts. Returns a (hosts, keys) array where each row holds the keys of
+        a host in order of priority; the hosts with the greatest keys are used
+        first for allocation.
+        """
+
+        # The default condition ranks every host the same
+        if type(self).host_alloc_condition is Scheduler.host_alloc_condition:
+            return np.ones((len(hostnames), 1))
+
+        # Fall back to scoring each host separately
+        scores = [self.host_alloc_condition(hostname, job) for hostname in hostnames]
+        return np.array(scores, dtype=float).reshape(len(hostnames), -1)
+
+    def select_hosts(self, scores: np.ndarray, num_of_hosts: int) -> np.ndarray:
+        """Return the positions of the num_of_hosts rows with the greatest
+        keys in descending order; rows with equal keys keep their order
+        """
+        keys = -scores
+
+        # Only the rows whose primary key is not worse than the one of the
+        # num_of_hosts-th best row are candidates
+        if num_of_hosts < len(keys):
+            kth_key = np.partition(keys[:, 0], num_of_hosts - 1)[num_of_hosts - 1]
+            candidates = np.flatnonzero(keys[:, 0] <= kth_key)
+        else:
+            candidates = np.arange(len(keys))
+
+        # Sort the candidates by their keys and then by their position
+        order = np.lexsort((candidates, *keys[candidates].T[::-1]))
+
+        return candidates[order[:num_of_hosts]]
+
     def allocation(self, job: Job, socket_conf: tuple, immediate=False) -> bool:
         """We allocate first to the idle hosts and then to the in use hosts
         """
@@ -213,30 +283,26 @@ class Scheduler(ABC):
         job.socket_conf = socket_conf
 
         # Get only the suitable hosts
-        suitable_hosts, req_okay = self.find_suitable_nodes(job.num_of_processes, 
-                                                            socket_conf, immediate=immediate)
+        hostnames, req_okay = self.find_suitable_hosts(job.num_of_processes, 
+                                                       socket_conf, immediate=immediate)
 
         # If no suitable hosts where found
         if not req_okay:
             return False
 
-        # Apply the colocation condition
-        suitable_hosts = dict(
-                sorted(suitable_hosts.items(), key=lambda it: self.host_alloc_condition(it[0], job), reverse=True)
-        )
-
         # Calculate how many cores per node and the number 
         # of nodes needed to satisfy the job
         needed_ppn = sum(job.socket_conf)
         needed_hosts = ceil(job.num_of_processes / needed_ppn)
 
-        req_hosts = needed_hosts
-        req_hosts_psets = list()
-        for hostname, psets in suitable_hosts.items():
-            req_hosts_psets.append((hostname, psets))
-            req_hosts -= 1
-            if req_hosts == 0:
-                break
+        # Apply the colocation condition only to pick the needed hosts
+        if len(hostnames) > 1:
+            positions = self.select_hosts(self.host_alloc_scores(hostnames, job), needed_hosts)
+            hostnames = [hostnames[position] for position in positions.tolist()]
+
+        # Only the selected hosts have their free cores looked up
+        req_hosts_psets = [(hostname, self.cluster.hosts[hostname].get_free_psets(socket_conf))
+                           for hostname in hostnames[:needed_hosts]]
 
         self.compeng.deploy_job_to_hosts(req_hosts_psets, job)
 
@@ -250,9 +316,7 @@ class Scheduler(ABC):
     def pop(self, queue: list[Job]) -> Job:
         """Get and remove an object from a queue
         """
-        obj = queue[0]
-        queue.remove(obj)
-        return obj
+        return queue.pop(0)
 
     @abstractmethod
     def setup(self) -> None:
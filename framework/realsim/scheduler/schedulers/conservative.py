@@ -1,13 +1,11 @@
 import os
 import sys
-from functools import reduce
 
 sys.path.append(os.path.abspath(os.path.join(
     os.path.dirname(__file__), "../../../"
 )))
 
-from realsim.cluster.host import Host
-from realsim.jobs.utils import deepcopy_list
+from realsim.scheduler.availability import AvailabilityProfile
 from realsim.scheduler.schedulers.fifo import FIFOScheduler
 from math import inf
 
@@ -20,99 +18,71 @@ class ConservativeScheduler(FIFOScheduler):
     def __init__(self):
         FIFOScheduler.__init__(self)
         self.backfill_enabled = True
+        # Any job that arrives may be backfilled
+        self.triggers = {"arrivals", "deploys", "releases"}
 
-    def reserve(self, free_slots, execution_list, blocked_job):
+    def setup(self):
+        FIFOScheduler.setup(self)
 
-        execution_list.sort(key=lambda job: job.wall_time + job.start_time - self.cluster.makespan)
-        min_estimated_time = inf
-        rslots = free_slots # Reservation slots
+        # Free nodes along time as booked by the executing jobs
+        self.profile = AvailabilityProfile(len(self.cluster.hosts), self.cluster.makespan)
 
-        for xjob in execution_list:
+        # The booking of each executing job: (estimated end time, nodes)
+        self.bookings: dict[int, tuple[float, int]] = dict()
 
-            rslots += xjob.assigned_hosts
+    def update_profile(self) -> None:
+        """Book the jobs that started and release the remaining booking of the
+        jobs that finished since the last update
+        """
+        now = self.cluster.makespan
 
-            if len(rslots) >= blocked_job.full_socket_nodes:
-                min_estimated_time = xjob.wall_time - (self.cluster.makespan - xjob.start_time)
-                break
+        for job_id in [job_id for job_id in self.bookings if job_id not in self.cluster.execution_index]:
+            end_time, nodes = self.bookings.pop(job_id)
+            self.profile.release(now, end_time - now, nodes)
 
-        # If a job couldn't reserve cores then cancel backfill at this point
-        if not min_estimated_time < inf:
-            return False
-        else:
-            execution_list.append(blocked_job)
-            free_slots -= rslots
-
-    # find_reservation([], 0, blocked_job, idle_hosts, waiting_queue, execution_list)
-
-    def find_reservation(self, reserves, start_time, blocked_job, free_slots, waiting_queue, execution_list):
-
-        if not start_time < inf:
-            return reserves
-
-        # Calculate the estimated start time of blocked job
-        execution_list.sort(key=lambda job: job.wall_time + job.start_time - self.cluster.makespan)
-        min_estimated_time = inf
-        rslots = free_slots
-        jobs_to_finish = list()
-
-        for xjob in execution_list:
-
-            rslots += xjob.assigned_hosts
-            jobs_to_finish.append(xjob)
-
-            if len(rslots) >= blocked_job.full_socket_nodes:
-                min_estimated_time = xjob.wall_time - (self.cluster.makespan - xjob.start_time)
-                break
-
-        reserves.append(start_time + min_estimated_time)
-        free_slots = [name for name in free_slots if name not in rslots]
-        
-        for xjob in execution_list:
-            xjob.remaining_time -= min_estimated_time
-        execution_list = [xjob for xjob in execution_list if xjob.remaining_time > 0]
-        execution_list.append(blocked_job)
-        
-        if waiting_queue != []:
-            blocked_job = waiting_queue[0]
-        else:
-            return reserves
-        waiting_queue.remove(blocked_job)
-
-        return self.find_reservation(
-                reserves,
-                start_time + min_estimated_time,
-                blocked_job,
-                free_slots,
-                waiting_queue,
-                execution_list
-        )
+        for job_id, xjob in self.cluster.execution_index.items():
+            if job_id not in self.bookings:
+                end_time = xjob.start_time + xjob.wall_time
+                nodes = len(xjob.assigned_hosts)
+                self.profile.reserve(xjob.start_time, xjob.wall_time, nodes)
+                self.bookings[job_id] = (end_time, nodes)
 
+        # The jobs are booked from their start time before the past is
+        # forgotten
+        self.profile.advance(now)
 
     def backfill(self) -> bool:
 
         deployed = False
 
         if len(self.cluster.waiting_queue) <= 1:
+            self.next_pass_time = inf
             return False
 
-        waiting_queue = deepcopy_list(self.cluster.waiting_queue[1:self.backfill_depth+1])
-        blocked_job = waiting_queue[0]
-        waiting_queue.remove(blocked_job)
-        execution_list = deepcopy_list(self.cluster.execution_list)
+        self.update_profile()
+
+        # Once an executing job overruns its booking the reservations move
+        # earlier without any change of the cluster state
+        self.next_pass_time = self.profile.times[1] if len(self.profile) > 1 else inf
+
+        # Reservations are recalculated on each pass so they are compressed
+        # whenever jobs finish earlier than their wall time
+        profile = self.profile.copy()
+        now = self.cluster.makespan
 
-        # Get all the idle hosts
-        idle_hosts = [host for host in list(self.cluster.hosts.values()) if host.state == Host.IDLE]
+        for job in self.cluster.waiting_queue[:self.backfill_depth+1]:
 
-        reserves = self.find_reservation([], 0, blocked_job, idle_hosts, waiting_queue, execution_list)
+            start_time = profile.earliest_fit(job.full_socket_nodes, job.wall_time, now)
 
-        # Get the backfilling candidates
-        backfilling_jobs = deepcopy_list(self.cluster.waiting_queue[1:self.backfill_depth+1])
+            # The job can never fit in the cluster
+            if not start_time < inf:
+                continue
 
-        for i, rtime in enumerate(reserves):
+            # Start the job if its reservation is now and it fits; otherwise
+            # hold the reservation for the rest of the waiting jobs
+            if start_time == now and self.compact_allocation(job, immediate=True):
+                deployed = True
 
-            if backfilling_jobs[i].wall_time <= rtime:
+            profile.reserve(start_time, job.wall_time, job.full_socket_nodes)
 
-                if self.compact_allocation(backfilling_jobs[i]):
-                    deployed = True
-        
         return deployed
@@ -6,7 +6,6 @@ sys.path.append(os.path.abspath(os.path.join(
 )))
 
 from realsim.scheduler.scheduler import Scheduler
-from realsim.jobs.utils import deepcopy_list
 
 
 class FIFOScheduler(Scheduler):
@@ -16,6 +15,9 @@ class FIFOScheduler(Scheduler):
 
     def __init__(self):
         Scheduler.__init__(self)
+        # A pass stops at the first job that can not be deployed and jobs that
+        # arrive behind it have to wait for it
+        self.triggers = {"releases"}
 
     def setup(self):
         Scheduler.setup(self)
@@ -24,7 +26,7 @@ class FIFOScheduler(Scheduler):
     def deploy(self) -> bool:
 
         deployed = False
-        waiting_queue = deepcopy_list(self.cluster.waiting_queue[:self.queue_depth])
+        waiting_queue = self.cluster.waiting_queue[:self.queue_depth]
 
         while waiting_queue != []:
 
@@ -0,0 +1,259 @@
+"""
+A trace can be split at the instants its cluster drains, when the waiting queue
+is empty and nothing executes. The simulation after such an instant does not
+depend on what came before, so the segments of a trace between drain points
+can be simulated in parallel and stitched back into a single simulation.
+
+The drain points are predicted before the simulation: the jobs submitted
+before a drain point must be able to finish, as a fluid that fills all the
+cores of the cluster, before the next job shows up. A prediction is verified
+after the segments are simulated; if the cluster had not drained by the time
+the next segment started, the two segments are merged and simulated again.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import logging
+from math import inf
+import os
+import sys
+from typing import Callable, Optional
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "../"
+)))
+
+from realsim.jobs.jobs import Job
+from realsim.database import Database
+from realsim.cluster.cluster import Cluster
+from realsim.logger.logger import Logger
+from realsim.compengine import ComputeEngine
+
+# Attributes of a scheduler that reference the other simulation components
+# instead of being options
+SCHEDULER_REFS = ["database", "cluster", "logger", "compeng"]
+
+
+def predict_drain_points(jobs: list[Job], total_cores: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return the positions of the jobs that are predicted to arrive at an
+    empty cluster, along with the slack time between the predicted drain and
+    their arrival
+    + jobs : the jobs sorted by submit time
+    + total_cores : the number of cores of the cluster
+    """
+    if len(jobs) < 2:
+        return np.zeros(0, dtype=np.intp), np.zeros(0)
+
+    submit = np.array([job.submit_time for job in jobs], dtype=float)
+    runtime = np.array([job.remaining_time for job in jobs], dtype=float)
+    area = runtime * np.array([job.num_of_processes for job in jobs], dtype=float)
+
+    # The backlog of work drains with all the cores of the cluster; every job
+    # also needs at least its run time after it shows up
+    drained = np.empty(len(jobs))
+    backlog_end = job_end = -inf
+    for position, (submit_time, job_runtime, job_area) in enumerate(zip(submit.tolist(), runtime.tolist(), area.tolist())):
+        backlog_end = max(backlog_end, submit_time) + job_area / total_cores
+        job_end = max(job_end, submit_time + job_runtime)
+        drained[position] = max(backlog_end, job_end)
+
+    slack = submit[1:] - drained[:-1]
+    positions = np.flatnonzero(slack > 0) + 1
+
+    return positions, slack[positions - 1]
+
+
+def select_boundaries(positions: np.ndarray, slack: np.ndarray, jobs_num: int, segments: int) -> list[int]:
+    """Pick up to segments - 1 of the predicted drain points that split the jobs
+    in parts of about the same size; near each cut the drain point with the
+    most slack is preferred
+    """
+    if segments < 2 or len(positions) == 0:
+        return []
+
+    width = jobs_num / segments
+    boundaries = set()
+    for cut in range(1, segments):
+        target = cut * width
+        near = np.flatnonzero(np.abs(positions - target) <= width / 2)
+        if len(near) == 0:
+            continue
+        boundaries.add(int(positions[near[np.argmax(slack[near])]]))
+
+    return sorted(boundaries)
+
+
+def simulate_segment(jobs: list[Job],
+                     heatmap: dict,
+                     cluster_cls: type[Cluster],
+                     nodes: int,
+                     socket_conf: tuple,
+                     sched_cls: type,
+                     sched_opts: dict) -> dict:
+    """Simulate the jobs of a segment on an empty cluster and return the
+    events that were logged for them. The jobs are already set up by the
+    compute engine of the whole trace, so they keep their ids and submit times.
+    """
+
+    database = Database(jobs, heatmap)
+    database.setup()
+
+    cluster = cluster_cls(nodes, socket_conf)
+
+    scheduler = sched_cls()
+    scheduler.__dict__.update(sched_opts)
+
+    evt_logger = Logger(debug=False)
+
+    compengine = ComputeEngine(database, cluster, scheduler, evt_logger)
+    compengine.debug_logger = logging.getLogger("segments")
+    cluster.id_counter = jobs[-1].job_id + 1
+
+    cluster.setup()
+    scheduler.setup()
+    evt_logger.setup()
+
+    while len(database.preloaded_queue) > 0 or cluster.waiting_queue != [] or cluster.execution_list != []:
+        compengine.sim_step()
+
+    first, last = jobs[0].job_id, jobs[-1].job_id + 1
+
+    return {
+        "first job": first,
+        "last job": last,
+        "first submit": jobs[0].submit_time,
+        "makespan": cluster.makespan,
+        "finished jobs": cluster.finished_jobs_num,
+        "submit times": evt_logger.submit_times[first:last].copy(),
+        "start times": evt_logger.start_times[first:last].copy(),
+        "finish times": evt_logger.finish_times[first:last].copy(),
+        "assigned cores": evt_logger.assigned_cores[first:last].copy(),
+        "allocations": evt_logger.allocations,
+        "cluster events": evt_logger.cluster_events
+    }
+
+
+def merge_segments(results: list[dict], cluster: Cluster, evt_logger: Logger) -> None:
+    """Stitch the events of consecutive segments into the logger of the whole
+    trace, as if the trace was simulated at once
+    """
+
+    cluster_events = evt_logger.cluster_events
+    finished_jobs = 0
+
+    for index, result in enumerate(results):
+        first, last = result["first job"], result["last job"]
+        evt_logger.submit_times[first:last] = result["submit times"]
+        evt_logger.start_times[first:last] = result["start times"]
+        evt_logger.finish_times[first:last] = result["finish times"]
+        evt_logger.assigned_cores[first:last] = result["assigned cores"]
+        evt_logger.allocations.update(result["allocations"])
+
+        # Every segment starts with the checkpoint of the empty cluster at 0
+        # which only the first one keeps
+        events = result["cluster events"]
+        skip = 0 if index == 0 else 1
+        if index == 0:
+            cluster_events["checkpoints"] = list()
+            cluster_events["unused cores"] = list()
+            cluster_events["finished jobs"] = list()
+        cluster_events["checkpoints"].extend(events["checkpoints"][skip:])
+        cluster_events["unused cores"].extend(events["unused cores"][skip:])
+        cluster_events["finished jobs"].extend([finished_jobs + finished
+                                                for finished in events["finished jobs"][skip:]])
+        for key, value in events.items():
+            if key.startswith("deploying:"):
+                cluster_events[key] = (0 if index == 0 else cluster_events[key]) + value
+
+        finished_jobs += result["finished jobs"]
+
+    evt_logger.invalidate_job_events()
+
+    cluster.makespan = results[-1]["makespan"]
+    cluster.finished_jobs_num = finished_jobs
+
+
+def simulate_segmented(database: Database,
+                       cluster: Cluster,
+                       scheduler,
+                       evt_logger: Logger,
+                       workers: int,
+                       progress: Optional[Callable[[int], None]] = None) -> int:
+    """Simulate a trace split at its predicted drain points with a pool of
+    workers. The cluster, the scheduler and the logger must be set up; when
+    the simulation finishes they hold the state of the whole trace. Returns
+    the number of segments the trace was simulated in; a single segment is
+    not simulated and the database keeps its jobs.
+    + progress : called with the number of jobs simulated so far
+    """
+
+    if database.jobs_stream is not None:
+        raise RuntimeError("A stream of jobs can not be split at drain points")
+
+    jobs = list(database.preloaded_queue)
+    if jobs == []:
+        return 0
+
+    positions, slack = predict_drain_points(jobs, cluster.total_cores)
+    boundaries = [0] + select_boundaries(positions, slack, len(jobs), workers) + [len(jobs)]
+
+    # Without a predicted drain point the trace is left to the caller to be
+    # simulated at once
+    if len(boundaries) == 2:
+        return 1
+
+    sched_cls = type(scheduler)
+    sched_opts = {opt: val for opt, val in scheduler.__dict__.items() if opt not in SCHEDULER_REFS}
+
+    # Results of the segments by the position of their first job
+    results: dict[int, dict] = dict()
+    pending = list(zip(boundaries[:-1], boundaries[1:]))
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+
+        while pending != []:
+
+            futures = {executor.submit(simulate_segment,
+                                       jobs[start:stop],
+                                       database.heatmap,
+                                       type(cluster),
+                                       cluster.nodes,
+                                       cluster.socket_conf,
+                                       sched_cls,
+                                       sched_opts): (start, stop)
+                       for start, stop in pending}
+
+            for future in as_completed(futures):
+                start, stop = futures[future]
+                results[start] = future.result()
+                done += stop - start
+                if progress is not None:
+                    progress(done)
+
+            # The cluster must have drained before the next segment started;
+            # otherwise the two segments are merged and simulated again
+            starts = sorted(results)
+            pending = list()
+            merged_start = None
+            for start, next_start in zip(starts, starts[1:] + [len(jobs)]):
+                result = results[start]
+                if next_start < len(jobs) and not result["makespan"] < results[next_start]["first submit"]:
+                    if merged_start is None:
+                        merged_start = start
+                    continue
+                if merged_start is not None:
+                    for position in [position for position in starts if merged_start <= position <= start]:
+                        discarded = results.pop(position)
+                        done -= discarded["last job"] - discarded["first job"]
+                    pending.append((merged_start, next_start))
+                    merged_start = None
+
+    merge_segments([results[start] for start in sorted(results)], cluster, evt_logger)
+
+    # The jobs of the database were all consumed by the segments
+    database.preloaded_queue = deque()
+
+    return len(results)
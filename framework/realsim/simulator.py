@@ -27,7 +27,7 @@ def run_sim(core):
 
     # The stopping condition is for the waiting queue and the execution list
     # to become empty
-    while database.preloaded_queue != [] or cluster.waiting_queue != [] or cluster.execution_list != []:
+    while len(database.preloaded_queue) > 0 or cluster.waiting_queue != [] or cluster.execution_list != []:
         compengine.sim_step()
 
     if cluster.get_idle_cores() != cluster.free_cores:
@@ -167,7 +167,7 @@ class Simulation:
 
         # The stopping condition is for the waiting queue and the execution list
         # to become empty
-        while self.default_database.preloaded_queue != [] or self.default_cluster.waiting_queue != [] or self.default_cluster.execution_list != []:
+        while len(self.default_database.preloaded_queue) > 0 or self.default_cluster.waiting_queue != [] or self.default_cluster.execution_list != []:
             self.default_compengine.sim_step()
 
         # Submit to the shared list the results
@@ -0,0 +1,103 @@
+"""
+Snapshots of a running simulation. A snapshot stores the state of the compute
+engine together with the database, the cluster, the scheduler and the logger
+that it references: the preloaded and waiting queues, the occupancy of the
+hosts, the remaining times of the executing jobs and their finish events, the
+columns of the logger and whatever the scheduler keeps through its
+snapshot_state hook.
+
+A snapshot file is gzip compressed and holds two pickles: a small header with
+the version of the format and a summary of the simulation, so that it can be
+inspected without loading the state, followed by the state itself.
+"""
+
+import gzip
+import os
+import pickle
+import sys
+from typing import TYPE_CHECKING, Optional
+
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "../"
+)))
+
+if TYPE_CHECKING:
+    from realsim.compengine import ComputeEngine
+    from realsim.scheduler.scheduler import Scheduler
+
+# Bumped whenever the state of the simulation components changes in a way
+# that older snapshots can not be restored
+SNAPSHOT_VERSION = 2
+
+
+def snapshot_header(compengine: "ComputeEngine") -> dict:
+    return {
+        "version": SNAPSHOT_VERSION,
+        "scheduler": compengine.scheduler.name,
+        "makespan": compengine.cluster.makespan,
+        "finished jobs": compengine.cluster.finished_jobs_num,
+        "waiting jobs": len(compengine.cluster.waiting_queue),
+        "executing jobs": len(compengine.cluster.execution_list)
+    }
+
+
+def save_snapshot(compengine: "ComputeEngine", path: str) -> None:
+    """Store the state of the simulation; the file is replaced atomically so
+    that a crash while saving keeps the previous snapshot
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+
+    with gzip.open(tmp_path, "wb", compresslevel=6) as fd:
+        pickle.dump(snapshot_header(compengine), fd, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(compengine, fd, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_header(path: str) -> dict:
+    with gzip.open(path, "rb") as fd:
+        header = pickle.load(fd)
+
+    if not isinstance(header, dict) or header.get("version") != SNAPSHOT_VERSION:
+        raise RuntimeError(f"The snapshot {path} is not of version {SNAPSHOT_VERSION}")
+
+    return header
+
+
+def load_snapshot(path: str) -> "ComputeEngine":
+    """Restore a simulation from a snapshot; the database, cluster, scheduler
+    and logger are reached through the compute engine that is returned
+    """
+    with gzip.open(path, "rb") as fd:
+        header = pickle.load(fd)
+        if not isinstance(header, dict) or header.get("version") != SNAPSHOT_VERSION:
+            raise RuntimeError(f"The snapshot {path} is not of version {SNAPSHOT_VERSION}")
+        compengine = pickle.load(fd)
+
+    return compengine
+
+
+def fork_simulation(compengine: "ComputeEngine",
+                    scheduler: Optional["Scheduler"] = None) -> "ComputeEngine":
+    """Copy a simulation so that it continues independently, for example to
+    run what-if scenarios from a shared warm-up prefix. The copy does not
+    checkpoint. If a scheduler is given it replaces the scheduler of the copy
+    and is set up for the current state of the cluster.
+    """
+    fork: "ComputeEngine" = pickle.loads(pickle.dumps(compengine, protocol=pickle.HIGHEST_PROTOCOL))
+    fork.set_checkpoints(None)
+
+    if scheduler is not None:
+        scheduler.database = fork.db
+        scheduler.cluster = fork.cluster
+        scheduler.logger = fork.logger
+        scheduler.compeng = fork
+        fork.scheduler = scheduler
+        fork.logger.scheduler = scheduler
+        scheduler.setup()
+
+        # The new scheduler has not seen the waiting queue yet
+        fork.last_pass_version = None
+
+    return fork
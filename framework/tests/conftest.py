@@ -0,0 +1,108 @@
+import logging
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(
+    os.path.dirname(__file__), "../"
+)))
+
+from realsim.cluster.cluster import Cluster
+from realsim.compengine import ComputeEngine
+from realsim.database import Database
+from realsim.generators.swf import SWFGenerator
+from realsim.logger.logger import Logger
+from realsim.scheduler.coschedulers.ranks.bester import BesterCoscheduler
+from realsim.scheduler.coschedulers.ranks.filler import FillerCoscheduler
+from realsim.scheduler.coschedulers.ranks.jungle import JungleCoscheduler
+from realsim.scheduler.coschedulers.ranks.randomranks import RandomRanksCoscheduler
+from realsim.scheduler.coschedulers.ranks.slowdown import SlowdownRanksCoscheduler
+from realsim.scheduler.schedulers.conservative import ConservativeScheduler
+from realsim.scheduler.schedulers.easy import EASYScheduler
+from realsim.scheduler.schedulers.fifo import FIFOScheduler
+
+SCHEDULERS = [FIFOScheduler, EASYScheduler, ConservativeScheduler,
+              RandomRanksCoscheduler, FillerCoscheduler, BesterCoscheduler,
+              JungleCoscheduler, SlowdownRanksCoscheduler]
+
+APPS = [f"app{idx}" for idx in range(8)]
+
+NODES = 16
+SOCKET_CONF = (8, 8)
+
+
+def write_swf(path, jobs_num, seed):
+    """Write a synthetic SWF trace whose bursts of jobs alternate with idle
+    periods, so that the cluster both saturates and drains
+    """
+    rnd = random.Random(seed)
+    submit_time = 0
+    with open(path, "w") as fd:
+        fd.write("; synthetic trace\n")
+        for job_id in range(1, jobs_num + 1):
+            submit_time += rnd.choice([0, 0, 5, 30, 120, 600, 20000 if job_id % 40 == 0 else 0])
+            submit_time += 50000 if job_id % 50 == 0 else 0
+            run_time = rnd.randint(10, 4000)
+            procs = rnd.choice([4, 8, 16, 32, 64, 100, 128])
+            wall_time = run_time * rnd.choice([1, 2, 3])
+            record = [job_id, submit_time, 0, run_time, procs, -1, -1, procs, wall_time,
+                      -1, 1, 1, 1, rnd.choice(APPS), 1, 1, -1, -1]
+            fd.write(" ".join(map(str, record)) + "\n")
+    return str(path)
+
+
+def make_heatmap(seed):
+    """A heatmap with some unknown speedups
+    """
+    rnd = random.Random(seed)
+    return {app: {coapp: None if rnd.random() < 0.15 else round(rnd.uniform(0.7, 1.4), 2)
+                  for coapp in APPS}
+            for app in APPS}
+
+
+def build_simulation(trace, heatmap, sched_cls):
+    """Set up a simulation of a trace; returns its compute engine
+    """
+    database = Database(SWFGenerator().generate_jobs_set(trace), heatmap)
+    database.setup()
+    cluster = Cluster(NODES, SOCKET_CONF)
+    scheduler = sched_cls()
+    evt_logger = Logger(debug=False)
+    compengine = ComputeEngine(database, cluster, scheduler, evt_logger)
+    compengine.setup_preloaded_jobs()
+    compengine.debug_logger = logging.getLogger("tests")
+    cluster.setup()
+    scheduler.setup()
+    evt_logger.setup()
+    return compengine
+
+
+def finished(compengine):
+    return (len(compengine.db.preloaded_queue) == 0
+            and compengine.cluster.waiting_queue == []
+            and compengine.cluster.execution_list == [])
+
+
+def run_to_end(compengine):
+    while not finished(compengine):
+        compengine.sim_step()
+    return compengine
+
+
+def job_times(evt_logger):
+    """The submit, start and finish time of every job by its id
+    """
+    return {job_id: (record["submit time"], record["start time"], record["finish time"])
+            for job_id, record in evt_logger.job_events.items()}
+
+
+@pytest.fixture(scope="session")
+def trace(tmp_path_factory):
+    return write_swf(tmp_path_factory.mktemp("traces") / "trace.swf", 200, 2)
+
+
+@pytest.fixture(scope="session")
+def heatmap():
+    return make_heatmap(7)
@@ -0,0 +1,18 @@
+import pytest
+
+from conftest import SCHEDULERS, build_simulation, job_times, run_to_end
+
+
+@pytest.mark.parametrize("sched_cls", SCHEDULERS, ids=lambda cls: cls.__name__)
+def test_skipped_passes_do_not_change_schedule(trace, heatmap, sched_cls):
+    """Skipping the scheduler passes that can not deploy a job must give the
+    same schedule as running every pass
+    """
+    skipping = run_to_end(build_simulation(trace, heatmap, sched_cls))
+
+    every_pass = build_simulation(trace, heatmap, sched_cls)
+    every_pass.scheduling_needed = lambda: True
+    run_to_end(every_pass)
+
+    assert skipping.cluster.makespan == every_pass.cluster.makespan
+    assert job_times(skipping.logger) == job_times(every_pass.logger)
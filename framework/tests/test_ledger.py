@@ -0,0 +1,149 @@
+import json
+import os
+import pickle
+
+import pytest
+
+from batch.ledger import clear_ledger, inputs_dir, pending_simulations, read_ledger, record_completion
+
+# A generator that draws a new random workload on every call and counts its
+# calls next to itself
+RANDOM_GENERATOR = '''
+import os
+import random
+
+from realsim.generators.AGenerator import AbstractGenerator
+from realsim.jobs.jobs import Job
+
+
+class FreshRandomGenerator(AbstractGenerator[int]):
+
+    name = "Fresh Random Generator"
+
+    def generate_job(self, idx, rnd, submit_time):
+        run_time = rnd.randint(10, 2000)
+        return Job(job_id=idx, job_name=f"app{rnd.randint(0, 7)}", num_of_processes=rnd.choice([8, 16, 64]),
+                   assigned_hosts=list(), remaining_time=run_time, submit_time=submit_time,
+                   waiting_time=0, wall_time=2 * run_time)
+
+    def generate_jobs_set(self, arg):
+        with open(os.path.join(os.path.dirname(__file__), "calls"), "a") as fd:
+            fd.write("call\\n")
+        rnd = random.Random()
+        jobs, submit_time = list(), 0
+        for idx in range(int(arg)):
+            submit_time += rnd.choice([0, 10, 100])
+            jobs.append(self.generate_job(idx, rnd, submit_time))
+        return jobs
+'''
+
+
+def test_ledger_round_trip(tmp_path):
+    path = str(tmp_path / "project.ledger")
+
+    record_completion(path, 0, "a")
+    record_completion(path, 2, "c", scheduler="FIFO Scheduler")
+
+    # A line left incomplete by a crash is skipped and the next record
+    # starts on its own line
+    with open(path, "a") as fd:
+        fd.write('{"sim_idx": 1, "ha')
+    record_completion(path, 3, "d")
+
+    assert read_ledger(path) == {0: "a", 2: "c", 3: "d"}
+
+    # A later record of a simulation overrides the earlier one
+    record_completion(path, 2, "changed")
+    assert read_ledger(path)[2] == "changed"
+
+    assert pending_simulations(path, ["a", "b", "c", "d"], resume=True) == [1, 2]
+    assert pending_simulations(path, ["a", "b", "c", "d"], resume=False) == [0, 1, 2, 3]
+
+    clear_ledger(path)
+    assert read_ledger(path) == dict()
+
+
+@pytest.fixture
+def random_project(tmp_path, heatmap):
+    from api.loader import LoadManager
+
+    with open(tmp_path / "lm.pkl", "wb") as fd:
+        pickle.dump(LoadManager(machine="machine", suite="suite"), fd)
+    with open(tmp_path / "heatmap.json", "w") as fd:
+        json.dump(heatmap, fd)
+    with open(tmp_path / "generator.py", "w") as fd:
+        fd.write(RANDOM_GENERATOR)
+
+    project = {
+        "name": "random resume",
+        "inputs": [{
+            "load-manager": str(tmp_path / "lm.pkl"),
+            "heatmap": str(tmp_path / "heatmap.json"),
+            "generator": {"type": str(tmp_path / "generator.py"), "arg": 50},
+            "cluster": {"nodes": 8, "socket-conf": [8, 8]},
+            "repeat": 2
+        }],
+        "schedulers": [{"base": "FIFO Scheduler"}, {"base": "EASY Scheduler"}],
+        "actions": {}
+    }
+    path = tmp_path / "project.yml"
+    with open(path, "w") as fd:
+        json.dump(project, fd)
+
+    return str(path)
+
+
+def jobs_of(rank):
+    return [(job.job_name, job.num_of_processes, job.remaining_time, job.submit_time)
+            for job in rank[3].preloaded_queue]
+
+
+def generator_calls(project):
+    with open(os.path.join(os.path.dirname(project), "calls")) as fd:
+        return len(fd.readlines())
+
+
+def test_resumed_project_reuses_the_generated_jobs(random_project):
+    from batch.batch_utils import BatchCreator
+
+    batch_creator = BatchCreator(random_project)
+    clear_ledger(batch_creator.ledger_path)
+    batch_creator.create_ranks()
+    ranks = {rank[0]: rank for rank in batch_creator.ranks}
+    assert generator_calls(random_project) == 2
+    assert os.path.isdir(inputs_dir(batch_creator.ledger_path))
+
+    # The first input finished for both schedulers, the second for one
+    for sim_idx in [0, 1, 2]:
+        record_completion(batch_creator.ledger_path, sim_idx, ranks[sim_idx][10])
+
+    resumed = BatchCreator(random_project)
+    assert resumed.get_pending_sims(resume=True) == [3]
+    resumed.create_ranks(resume=True)
+
+    # The finished input is not generated again and the pending simulation
+    # runs on the same jobs as the finished one of its input
+    assert generator_calls(random_project) == 2
+    assert [rank[0] for rank in resumed.ranks] == [3]
+    assert jobs_of(resumed.ranks[0]) == jobs_of(ranks[2])
+    assert resumed.ranks[0][10] == ranks[3][10]
+
+
+def test_lost_jobs_rerun_the_whole_input(random_project):
+    from batch.batch_utils import BatchCreator
+
+    batch_creator = BatchCreator(random_project)
+    clear_ledger(batch_creator.ledger_path)
+    batch_creator.create_ranks()
+    for rank in batch_creator.ranks:
+        if rank[0] != 3:
+            record_completion(batch_creator.ledger_path, rank[0], rank[10])
+
+    # Without the stored jobs of the second input its simulations can not be
+    # compared to a new one, so they all run again
+    for name in os.listdir(inputs_dir(batch_creator.ledger_path)):
+        if name.startswith("input_1_"):
+            os.remove(os.path.join(inputs_dir(batch_creator.ledger_path), name))
+
+    resumed = BatchCreator(random_project)
+    assert resumed.get_pending_sims(resume=True) == [2, 3]
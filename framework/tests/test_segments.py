@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import build_simulation, job_times, run_to_end
+from realsim.scheduler.coschedulers.ranks.filler import FillerCoscheduler
+from realsim.scheduler.schedulers.conservative import ConservativeScheduler
+from realsim.scheduler.schedulers.easy import EASYScheduler
+from realsim.scheduler.schedulers.fifo import FIFOScheduler
+import realsim.segments as segments
+
+SCHEDULERS = [FIFOScheduler, EASYScheduler, ConservativeScheduler, FillerCoscheduler]
+
+
+def outputs(compengine):
+    cluster, evt_logger = compengine.cluster, compengine.logger
+    return {
+        "makespan": cluster.makespan,
+        "finished jobs": cluster.finished_jobs_num,
+        "jobs": job_times(evt_logger),
+        "procs": {job_id: str(record["assigned procs"]) for job_id, record in evt_logger.job_events.items()},
+        "cluster events": evt_logger.cluster_events
+    }
+
+
+def simulate_split(trace, heatmap, sched_cls, workers):
+    compengine = build_simulation(trace, heatmap, sched_cls)
+    segments_num = segments.simulate_segmented(compengine.db, compengine.cluster, compengine.scheduler,
+                                               compengine.logger, workers)
+    # A trace without drain points is left to be simulated at once
+    run_to_end(compengine)
+    return segments_num, compengine
+
+
+@pytest.mark.parametrize("sched_cls", SCHEDULERS, ids=lambda cls: cls.__name__)
+def test_split_matches_sequential(trace, heatmap, sched_cls):
+    sequential = run_to_end(build_simulation(trace, heatmap, sched_cls))
+    segments_num, split = simulate_split(trace, heatmap, sched_cls, 4)
+
+    assert segments_num > 1
+    assert outputs(split) == outputs(sequential)
+
+
+@pytest.mark.parametrize("sched_cls", SCHEDULERS, ids=lambda cls: cls.__name__)
+def test_failed_drain_points_are_merged(trace, heatmap, sched_cls, monkeypatch):
+    """Cut the trace at two drain points and at two positions where the
+    cluster does not drain; the segments around the latter must be merged and
+    simulated again
+    """
+    cuts = [30, 49, 120, 149]
+    monkeypatch.setattr(segments, "select_boundaries", lambda positions, slack, jobs_num, parts: cuts)
+
+    sequential = run_to_end(build_simulation(trace, heatmap, sched_cls))
+    segments_num, split = simulate_split(trace, heatmap, sched_cls, 4)
+
+    assert 1 < segments_num < len(cuts) + 1
+    assert outputs(split) == outputs(sequential)
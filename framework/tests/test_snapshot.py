@@ -0,0 +1,50 @@
+import pytest
+
+from conftest import SCHEDULERS, build_simulation, finished, job_times, run_to_end
+from realsim.scheduler.schedulers.easy import EASYScheduler
+from realsim.scheduler.schedulers.fifo import FIFOScheduler
+from realsim.snapshot import SNAPSHOT_VERSION, fork_simulation, load_snapshot, read_snapshot_header, save_snapshot
+
+
+def run_steps(compengine, steps):
+    for _ in range(steps):
+        if finished(compengine):
+            break
+        compengine.sim_step()
+    return compengine
+
+
+@pytest.mark.parametrize("sched_cls", SCHEDULERS, ids=lambda cls: cls.__name__)
+def test_restored_simulation_continues_identically(trace, heatmap, sched_cls, tmp_path):
+    uninterrupted = run_to_end(build_simulation(trace, heatmap, sched_cls))
+
+    path = str(tmp_path / "simulation.snapshot")
+    interrupted = run_steps(build_simulation(trace, heatmap, sched_cls), 150)
+    save_snapshot(interrupted, path)
+
+    header = read_snapshot_header(path)
+    assert header["version"] == SNAPSHOT_VERSION
+    assert header["makespan"] == interrupted.cluster.makespan
+    assert header["finished jobs"] == interrupted.cluster.finished_jobs_num
+
+    restored = run_to_end(load_snapshot(path))
+
+    assert restored.cluster.makespan == uninterrupted.cluster.makespan
+    assert job_times(restored.logger) == job_times(uninterrupted.logger)
+
+
+def test_fork_is_independent(trace, heatmap):
+    compengine = run_steps(build_simulation(trace, heatmap, FIFOScheduler), 150)
+    makespan = compengine.cluster.makespan
+
+    # A fork with the same scheduler ends like the original
+    same = run_to_end(fork_simulation(compengine))
+    assert compengine.cluster.makespan == makespan
+
+    # A fork with another scheduler runs on its own copy of the state
+    other = run_to_end(fork_simulation(compengine, EASYScheduler()))
+    assert other.scheduler.cluster is other.cluster
+    assert compengine.cluster.makespan == makespan
+
+    run_to_end(compengine)
+    assert job_times(same.logger) == job_times(compengine.logger)
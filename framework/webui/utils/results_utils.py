@@ -18,6 +18,7 @@ from dash.exceptions import PreventUpdate
 
 # WebUI dependencies
 from webui.utils.common_utils import get_session_dir
+from realsim.logger.animation import replay_animated_cluster
 
 def import_results(path: str):
     # If it exists and is a file return the contents
@@ -454,6 +455,8 @@ def draw_canvas_scheduler(n_clicks, results_data, schematic_data):
         case _:
             # For Plotly graphs
             data = json.loads(result)
+            if action == "get-animated-clusters":
+                data = replay_animated_cluster(data)
             fig = from_json(data)
             fig["layout"]["template"] = "plotly_dark"
             fig["layout"]["plot_bgcolor"] = "#f2f2f2"